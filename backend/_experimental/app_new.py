@@ -9,7 +9,9 @@ from dotenv import load_dotenv
 
 # Import services
 from services.sentiment_service import analyze_sentiment
-from services.youtube_service import get_comments, batch_comments
+from services.youtube_service import get_comments
+from services.comment_batching import batch_comments
+from services.dedup import collapse_duplicates, with_counts
 from services.openai_service import (
     initialize_openai_client,
     get_transcript,
@@ -18,6 +20,7 @@ from services.openai_service import (
     create_final_summary
 )
 from utils.youtube_helper import extract_video_id, get_video_info
+from services.result_store import get_result_store
 
 # Load environment variables
 load_dotenv()
@@ -32,6 +35,81 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize OpenAI client
 initialize_openai_client(OPENAI_API_KEY)
 
+def run_analysis(video_id):
+    """
+    Run the full analysis pipeline for a video.
+    
+    Returns:
+    - The results dict, or None if the video does not exist
+    """
+    # Get video information
+    video_info = get_video_info(video_id, YOUTUBE_API_KEY)
+    if not video_info:
+        return None
+    
+    # Get comments
+    comments = get_comments(video_id, YOUTUBE_API_KEY)
+    
+    # Get transcript and summary
+    transcript = get_transcript(video_id)
+    transcript_summary = get_transcript_summary(transcript)
+    
+    # Check if there was an API quota error with transcript summary
+    quota_error = False
+    if "OpenAI API quota exceeded" in transcript_summary:
+        quota_error = True
+    
+    # Collapse near-duplicates, then batch comments and get summaries
+    comment_batches = batch_comments(with_counts(collapse_duplicates(comments)))
+    comment_summaries = get_comments_summaries(comment_batches)
+    
+    # Check if there was an API quota error with comment summaries
+    for summary in comment_summaries:
+        if "OpenAI API quota exceeded" in summary:
+            quota_error = True
+            break
+    
+    # Create final summary
+    final_summary = create_final_summary(comment_summaries, transcript_summary)
+    
+    # Analyze sentiment
+    sentiment_counts = analyze_sentiment(comments)
+    
+    # Prepare results
+    return {
+        'videoId': video_id,
+        'videoTitle': video_info['title'],
+        'channelTitle': video_info['channelTitle'],
+        'commentCount': len(comments),
+        'sentiment': sentiment_counts,
+        'summary': final_summary,
+        'transcriptSummary': transcript_summary,
+        'apiQuotaExceeded': quota_error
+    }
+
+def store_results(video_id, results):
+    """Persist results so /api/results can serve them without re-running the pipeline."""
+    # Don't keep degraded results around, the next request should try again
+    if results.get('apiQuotaExceeded'):
+        return
+    try:
+        get_result_store().put(video_id, results)
+    except Exception as e:
+        print(f"Error storing results: {e}")
+
+def analysis_error_response(e):
+    """Build the error response for a failed analysis."""
+    print(f"Error processing request: {e}")
+    error_msg = str(e)
+    
+    if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
+        return jsonify({
+            'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
+            'apiQuotaExceeded': True
+        }), 429
+    
+    return jsonify({'error': 'Failed to process video'}), 500
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     """
@@ -58,64 +136,15 @@ def analyze():
         return jsonify({'error': 'Invalid YouTube URL or video ID'}), 400
     
     try:
-        # Get video information
-        video_info = get_video_info(video_id, YOUTUBE_API_KEY)
-        if not video_info:
+        results = run_analysis(video_id)
+        if results is None:
             return jsonify({'error': 'Video not found'}), 404
         
-        # Get comments
-        comments = get_comments(video_id, YOUTUBE_API_KEY)
-        
-        # Get transcript and summary
-        transcript = get_transcript(video_id)
-        transcript_summary = get_transcript_summary(transcript)
-        
-        # Check if there was an API quota error with transcript summary
-        quota_error = False
-        if "OpenAI API quota exceeded" in transcript_summary:
-            quota_error = True
-        
-        # Batch comments and get summaries
-        comment_batches = batch_comments(comments)
-        comment_summaries = get_comments_summaries(comment_batches)
-        
-        # Check if there was an API quota error with comment summaries
-        for summary in comment_summaries:
-            if "OpenAI API quota exceeded" in summary:
-                quota_error = True
-                break
-        
-        # Create final summary
-        final_summary = create_final_summary(comment_summaries, transcript_summary)
-        
-        # Analyze sentiment
-        sentiment_counts = analyze_sentiment(comments)
-        
-        # Prepare results
-        results = {
-            'videoId': video_id,
-            'videoTitle': video_info['title'],
-            'channelTitle': video_info['channelTitle'],
-            'commentCount': len(comments),
-            'sentiment': sentiment_counts,
-            'summary': final_summary,
-            'transcriptSummary': transcript_summary,
-            'apiQuotaExceeded': quota_error
-        }
-        
+        store_results(video_id, results)
         return jsonify(results)
         
     except Exception as e:
-        print(f"Error processing request: {e}")
-        error_msg = str(e)
-        
-        if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
-            return jsonify({
-                'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
-                'apiQuotaExceeded': True
-            }), 429
-        
-        return jsonify({'error': 'Failed to process video'}), 500
+        return analysis_error_response(e)
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
@@ -126,72 +155,33 @@ def get_results():
     - videoId: YouTube video ID
     
     Returns:
-    - Same as /api/analyze endpoint
+    - Same as /api/analyze endpoint, served from the result store when the
+      video was analysed recently
     """
     video_id = request.args.get('videoId')
     
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
     
+    # Serve the stored result of an earlier analysis when we have one
+    try:
+        stored = get_result_store().get(video_id)
+    except Exception as e:
+        print(f"Error reading stored results: {e}")
+        stored = None
+    if stored is not None:
+        return jsonify(stored)
+    
     try:
-        # Get video information
-        video_info = get_video_info(video_id, YOUTUBE_API_KEY)
-        if not video_info:
+        results = run_analysis(video_id)
+        if results is None:
             return jsonify({'error': 'Video not found'}), 404
         
-        # Get comments
-        comments = get_comments(video_id, YOUTUBE_API_KEY)
-        
-        # Get transcript and summary
-        transcript = get_transcript(video_id)
-        transcript_summary = get_transcript_summary(transcript)
-        
-        # Check if there was an API quota error with transcript summary
-        quota_error = False
-        if "OpenAI API quota exceeded" in transcript_summary:
-            quota_error = True
-        
-        # Batch comments and get summaries
-        comment_batches = batch_comments(comments)
-        comment_summaries = get_comments_summaries(comment_batches)
-        
-        # Check if there was an API quota error with comment summaries
-        for summary in comment_summaries:
-            if "OpenAI API quota exceeded" in summary:
-                quota_error = True
-                break
-        
-        # Create final summary
-        final_summary = create_final_summary(comment_summaries, transcript_summary)
-        
-        # Analyze sentiment
-        sentiment_counts = analyze_sentiment(comments)
-        
-        # Prepare results
-        results = {
-            'videoId': video_id,
-            'videoTitle': video_info['title'],
-            'channelTitle': video_info['channelTitle'],
-            'commentCount': len(comments),
-            'sentiment': sentiment_counts,
-            'summary': final_summary,
-            'transcriptSummary': transcript_summary,
-            'apiQuotaExceeded': quota_error
-        }
-        
+        store_results(video_id, results)
         return jsonify(results)
 
     except Exception as e:
-        print(f"Error processing request: {e}")
-        error_msg = str(e)
-        
-        if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
-            return jsonify({
-                'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
-                'apiQuotaExceeded': True
-            }), 429
-        
-        return jsonify({'error': 'Failed to process video'}), 500
+        return analysis_error_response(e)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -1,14 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import contextlib
+import contextvars
+import json
 import os
+import queue
 import re
-import time
-from googleapiclient.discovery import build
+import threading
+from concurrent.futures import CancelledError
 from openai import OpenAI
 from dotenv import load_dotenv
 import httpx
 from youtube_transcript_api import YouTubeTranscriptApi
 
+from services.comment_batching import COMMENT_SUMMARY_PROMPT
+from services.comment_replies import get_reply_fetcher, max_reply_calls, replies_enabled
+from services.comment_sampling import STRATEGIES, get_sampler, sampling_strategy
+from services.comment_stream import CommentIngest
+from services.completion_cache import bypass_cache, get_completion_cache
+from services.job_manager import JobManager, get_job_store
+from services.lexicon_sentiment import get_lexicon_engine
+from services.llm import chat_completion, chat_completion_stream
+from services.metrics import HTTP_REQUEST_SECONDS, REGISTRY, SERIALIZATION_SECONDS, request_timings, start_request, timed
+from services.pipeline import Stage, map_concurrently, run_stages
+from services.result_store import get_result_store
+from services.retry import deadline_scope, is_quota_error, retry_call
+from services.summarization import summarize_transcript
+from services.transcript_store import format_timestamp, get_transcript_store, parse_timestamp
+from services.video_state import get_video_state_store
+from services.youtube_client import call_youtube
+from services.youtube_quota import QuotaExhaustedError, get_quota_budget, seconds_until_reset
+
 # Lazy import transformers to avoid startup issues
 _pipeline = None
 def get_pipeline():
@@ -35,10 +57,38 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
-# YouTube API key from environment variables
+# YouTube API key from environment variables (YOUTUBE_API_KEYS takes a
+# comma-separated pool, see services.youtube_quota)
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Upper bound on pipeline stages running at the same time for one analysis
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+
+# Upper bound on OpenAI requests in flight for one comment summarisation
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+
+# Time budget for one analysis; retries stop once waiting would exceed it
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "300"))
+
+MERGE_SUMMARY_PROMPT = (
+    "You are given an existing summary of a YouTube video's comments, followed by summaries of "
+    "newly posted comments. Update the existing summary so it also covers the new comments, "
+    "keeping the detailed context."
+)
+
+# Background analysis jobs (POST /api/analyze with "async": true)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# Batch analysis (POST /api/analyze/batch): most videos per batch, videos
+# analysed at once, and YouTube quota units one batch may plan to spend
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+BATCH_QUOTA_UNITS = int(os.getenv("BATCH_QUOTA_UNITS", "2000"))
+
+VIDEO_ID_RE = re.compile(r"[a-zA-Z0-9_-]{11}")
+
 # Initialize OpenAI client with proper error handling
 openai_client_initialized = False
 client = None
@@ -50,7 +100,9 @@ try:
         try:
             client = OpenAI(
                 api_key=OPENAI_API_KEY,
-                http_client=httpx.Client()
+                http_client=httpx.Client(),
+                # Retries are handled by services.retry
+                max_retries=0
             )
             openai_client_initialized = True
             # Avoid printing unicode symbols that can crash some Windows consoles
@@ -71,213 +123,314 @@ def extract_video_id(url):
     match = re.search(regex, url)
     return match.group(1) if match else None
 
+def _video_info(item):
+    snippet = item['snippet']
+    return {
+        'title': snippet['title'],
+        'channelTitle': snippet['channelTitle'],
+        'publishedAt': snippet['publishedAt']
+    }
+
 def get_video_info(video_id):
     """Get basic information about a YouTube video."""
-    youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-    response = youtube.videos().list(
+    response = call_youtube(lambda youtube: youtube.videos().list(
         part="snippet",
         id=video_id
-    ).execute()
+    ))
     
     if not response['items']:
         return None
     
-    video_info = response['items'][0]['snippet']
-    return {
-        'title': video_info['title'],
-        'channelTitle': video_info['channelTitle'],
-        'publishedAt': video_info['publishedAt']
-    }
+    return _video_info(response['items'][0])
 
-def get_comments(video_id):
-    """Get comments for a YouTube video."""
-    youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-    comments = []
-    
-    try:
-        response = youtube.commentThreads().list(
+def get_videos_info(video_ids):
+    """Get basic information for many videos, 50 per request.
+
+    Returns a dict of video ID to info; videos that don't exist are missing.
+    """
+    infos = {}
+    for start in range(0, len(video_ids), 50):
+        response = call_youtube(lambda youtube: youtube.videos().list(
             part="snippet",
+            id=",".join(video_ids[start:start + 50]),
+            maxResults=50
+        ))
+        for item in response.get('items', []):
+            infos[item['id']] = _video_info(item)
+    return infos
+
+def get_playlist_video_ids(playlist_id, max_videos=50):
+    """Video IDs in a playlist, in playlist order."""
+    video_ids = []
+    page_token = None
+    while len(video_ids) < max_videos:
+        response = call_youtube(lambda youtube: youtube.playlistItems().list(
+            part="contentDetails",
+            playlistId=playlist_id,
+            maxResults=min(50, max_videos - len(video_ids)),
+            pageToken=page_token
+        ))
+        for item in response.get('items', []):
+            video_id = item.get('contentDetails', {}).get('videoId')
+            if video_id:
+                video_ids.append(video_id)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    return video_ids[:max_videos]
+
+def get_channel_video_ids(channel_id, max_videos=50):
+    """A channel's most recent uploads, newest first (via its uploads playlist)."""
+    response = call_youtube(lambda youtube: youtube.channels().list(
+        part="contentDetails",
+        id=channel_id
+    ))
+    if not response.get('items'):
+        return None
+    uploads = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+    return get_playlist_video_ids(uploads, max_videos)
+
+def _comment_record(comment, parent_id=None):
+    snippet = comment.get('snippet', {})
+    record = {'id': comment.get('id'), 'text': snippet.get('textDisplay', ''),
+              'publishedAt': snippet.get('publishedAt'), 'likeCount': snippet.get('likeCount', 0)}
+    if parent_id:
+        record['parentId'] = parent_id
+    return record
+
+def iter_comment_pages(video_id, known_ids=None, since=None, max_comments=None, order="time",
+                       replies=False):
+    """Fetch a video's top-level comments, a page at a time.
+
+    Yields lists of {'id', 'text', 'publishedAt', 'likeCount'} dicts as
+    each page arrives, newest first (or YouTube's top comments first with
+    `order="relevance"`). Paging stops at the first comment that is in
+    `known_ids` or was published at or before `since`, or once about
+    `max_comments` have been collected (by default every page is read,
+    leaving the caller to stop). API errors are raised.
+
+    With `replies`, each comment also carries `replyCount` and the
+    `replies` records YouTube embeds in the page (at no extra quota cost);
+    see services.comment_replies for fetching the rest.
+    """
+    count = 0
+    page_token = None
+    
+    while True:
+        comments = []
+        response = call_youtube(lambda youtube: youtube.commentThreads().list(
+            part="snippet,replies" if replies else "snippet",
             videoId=video_id,
             textFormat="plainText",
+            order=order,
+            pageToken=page_token,
             maxResults=100
-        ).execute()
+        ))
         
-        while response and 'items' in response:
-            for item in response['items']:
-                if 'snippet' in item and 'topLevelComment' in item['snippet'] and 'snippet' in item['snippet']['topLevelComment']:
-                    comment = item['snippet']['topLevelComment']['snippet'].get('textDisplay', '')
-                    if comment:
-                        comments.append(comment)
-            
-            if 'nextPageToken' in response and len(comments) < 500:
-                response = youtube.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    textFormat="plainText",
-                    pageToken=response['nextPageToken'],
-                    maxResults=100
-                ).execute()
-            else:
-                break
-                
-    except Exception as e:
-        print(f"Error fetching comments: {e}")
-        # Provide some sample comments for testing if the API fails
-        if not comments:
-            comments = [
-                "This video was really helpful, thank you!",
-                "I didn't like the audio quality but the content was good.",
-                "Can you make more videos like this? Very informative.",
-                "Not sure I agree with all points but interesting perspective.",
-                "The explanation at 2:15 was exactly what I needed to understand."
-            ]
-    
-    # Return at least some comments
-    if not comments:
-        comments = ["No comments were found for this video."]
+        for item in response.get('items', []):
+            top_level = item.get('snippet', {}).get('topLevelComment', {})
+            snippet = top_level.get('snippet')
+            if not snippet:
+                continue
+            comment_id = top_level.get('id') or item.get('id')
+            published_at = snippet.get('publishedAt')
+            # Everything from here on was covered by an earlier analysis
+            if (known_ids and comment_id in known_ids) or (since and published_at and published_at <= since):
+                if comments:
+                    yield comments
+                return
+            text = snippet.get('textDisplay', '')
+            if text:
+                record = {'id': comment_id, 'text': text, 'publishedAt': published_at,
+                          'likeCount': snippet.get('likeCount', 0)}
+                if replies:
+                    record['replyCount'] = item['snippet'].get('totalReplyCount', 0)
+                    record['replies'] = [
+                        reply for reply in (_comment_record(c, comment_id)
+                                            for c in item.get('replies', {}).get('comments', []))
+                        if reply['text']
+                    ]
+                comments.append(record)
         
-    return comments
+        if comments:
+            yield comments
+        count += len(comments)
+        page_token = response.get('nextPageToken')
+        if not page_token or (max_comments is not None and count >= max_comments):
+            return
 
-def get_transcript(video_id):
-    """Get transcript for a YouTube video."""
+def fetch_comment_replies(thread_id, max_replies=100):
+    """The first `max_replies` (at most 100, one comments.list call) replies to a comment thread."""
+    response = call_youtube(lambda youtube: youtube.comments().list(
+        part="snippet",
+        parentId=thread_id,
+        textFormat="plainText",
+        maxResults=min(100, max_replies)
+    ))
+    return [reply for reply in (_comment_record(c, thread_id) for c in response.get('items', [])) if reply['text']]
+
+# Used in place of real comments when none could be fetched
+SAMPLE_COMMENTS = [
+    "This video was really helpful, thank you!",
+    "I didn't like the audio quality but the content was good.",
+    "Can you make more videos like this? Very informative.",
+    "Not sure I agree with all points but interesting perspective.",
+    "The explanation at 2:15 was exactly what I needed to understand."
+]
+NO_COMMENTS = "No comments were found for this video."
+
+def sample_comment_records(texts):
+    return [{'id': None, 'text': text, 'publishedAt': None, 'likeCount': 0} for text in texts]
+
+def fetch_transcript_segments(video_id):
+    """Fetch the caption segments of a YouTube video from YouTube.
+
+    Returns a list of {'text', 'start', 'duration'} dicts, an empty list if
+    the video has no captions, or None if they could not be fetched.
+    """
     try:
         # Try to get English transcript first
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-        # Combine all transcript parts into a single string
-        full_transcript = ' '.join([item['text'] for item in transcript])
-        return full_transcript if full_transcript else "No transcript available for this video."
+        return retry_call(YouTubeTranscriptApi.get_transcript, video_id, languages=['en'])
     except Exception as e:
         print(f"Error fetching transcript: {e}")
         # Try to get transcript in any available language
         try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            # Get the first available transcript
-            if transcript_list.manual_captions:
-                transcript = transcript_list.manual_captions[0].fetch()
-            elif transcript_list.generated_captions:
-                transcript = transcript_list.generated_captions[0].fetch()
-            else:
-                return "No transcript available for this video."
-            
-            full_transcript = ' '.join([item['text'] for item in transcript])
-            return full_transcript if full_transcript else "No transcript available for this video."
+            transcript_list = retry_call(YouTubeTranscriptApi.list_transcripts, video_id)
+            # Manually created transcripts are listed before generated ones
+            for transcript in transcript_list:
+                return retry_call(transcript.fetch)
+            return []
         except Exception as e2:
             print(f"Error fetching transcript in any language: {e2}")
-            return "This is a placeholder transcript. The video may not have available captions."
+            return None
+
+def get_transcript_segments(video_id, start=None, end=None):
+    """Get the caption segments of a YouTube video, from the transcript store when it has them.
+
+    Same return values as fetch_transcript_segments(); with `start` and/or
+    `end` (seconds) only the segments overlapping that range are returned.
+    """
+    try:
+        store = get_transcript_store()
+        segments = store.get(video_id, start, end)
+        if segments is not None:
+            return segments
+    except Exception as e:
+        print(f"Error reading stored transcript: {e}")
+        store = None
+
+    segments = fetch_transcript_segments(video_id)
+    if segments is None:
+        return None
+    if store is not None:
+        try:
+            store.put(video_id, segments)
+        except Exception as e:
+            print(f"Error storing transcript: {e}")
+    if start is not None or end is not None:
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        segments = [s for s in segments if s['start'] < end and s['start'] + s.get('duration', 0) > start]
+    return segments
+
+def transcript_text(segments):
+    """Combine transcript segments into a single string."""
+    if segments is None:
+        return "This is a placeholder transcript. The video may not have available captions."
+    full_transcript = ' '.join([item['text'] for item in segments])
+    return full_transcript if full_transcript else "No transcript available for this video."
+
+def get_transcript(video_id):
+    """Get transcript for a YouTube video."""
+    return transcript_text(get_transcript_segments(video_id))
 
 def get_transcript_summary(transcript):
-    """Get a summary of the video transcript using OpenAI."""
+    """Get a summary of the video transcript using OpenAI.
+
+    `transcript` is the transcript text or its list of caption segments.
+    Transcripts too long for one request are summarised in parallel chunks
+    that are then combined (see services.summarization).
+    """
     # Check if OpenAI client is initialized
     if not openai_client_initialized or client is None:
         return "Transcript summary unavailable: OpenAI API is not configured."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Provide a detailed summary of the given youtube video transcript."},
-                {"role": "user", "content": transcript}
-            ]
-        )
-        return response.choices[0].message.content
+        return summarize_transcript(client, transcript, max_workers=OPENAI_MAX_CONCURRENCY)
     except Exception as e:
         print(f"Error in transcript summary: {e}")
         
         # Check if it's a quota exceeded error
-        error_str = str(e)
-        if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
+        if is_quota_error(e):
             return "Unable to generate transcript summary: OpenAI API quota exceeded. Please check your API key and billing details."
         
-        # For other errors, retry once after delay
-        time.sleep(60)  # Wait for 60 seconds before retrying
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Provide a detailed summary of the given youtube video transcript."},
-                    {"role": "user", "content": transcript}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as retry_error:
-            print(f"Retry failed: {retry_error}")
-            return "Unable to generate transcript summary due to API errors. Please try again later."
-
-def batch_comments(comments, max_tokens=2048):
-    """Split comments into manageable batches."""
-    batches = []
-    current_batch = []
-    current_length = 0
-
-    for comment in comments:
-        comment_length = len(comment.split())
-        if current_length + comment_length > max_tokens:
-            batches.append(current_batch)
-            current_batch = [comment]
-            current_length = comment_length
-        else:
-            current_batch.append(comment)
-            current_length += comment_length
-
-    if current_batch:
-        batches.append(current_batch)
+        return "Unable to generate transcript summary due to API errors. Please try again later."
 
-    return batches
+def summarize_comment_batch(batch, quota_exceeded):
+    """Summarise one batch of comments.
 
-def get_comments_summaries(batches):
-    """Get summaries of comment batches using OpenAI."""
-    summaries = []
-    quota_exceeded = False
+    Returns None (and sets `quota_exceeded`) once the OpenAI quota is used
+    up, so the remaining batches are skipped.
+    """
+    # Skip processing if quota already exceeded
+    if quota_exceeded.is_set():
+        return None
     
+    try:
+        return chat_completion(client, [
+            {"role": "system", "content": COMMENT_SUMMARY_PROMPT},
+            {"role": "user", "content": " ".join(batch)}
+        ], cancel_event=quota_exceeded)
+    except CancelledError:
+        return None
+    except Exception as e:
+        print(f"Error in comment summary: {e}")
+        
+        # Check if it's a quota exceeded error
+        if is_quota_error(e):
+            quota_exceeded.set()
+            return None
+        
+        return "Failed to summarize comments due to API errors."
+
+def collect_comment_summaries(results, quota_exceeded):
+    """Batch summaries in order, with a note in place of those lost to the quota."""
+    summaries = [summary for summary in results if summary is not None]
+    if quota_exceeded.is_set():
+        summaries.append("OpenAI API quota exceeded. Unable to process comments.")
+    return summaries
+
+def merge_comment_summaries(previous_summary, new_summaries):
+    """Fold summaries of newly posted comments into an existing comment summary."""
     # Check if OpenAI client is initialized
     if not openai_client_initialized or client is None:
-        return ["Comments summary unavailable: OpenAI API is not configured."]
-
-    for batch in batches:
-        # Skip processing if quota already exceeded
-        if quota_exceeded:
-            summaries.append("OpenAI API quota exceeded. Unable to process comments.")
-            continue
-            
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Summarize the following comments while keeping the detailed context."},
-                    {"role": "user", "content": " ".join(batch)}
-                ]
-            )
-            summaries.append(response.choices[0].message.content)
-        except Exception as e:
-            print(f"Error in comment summary: {e}")
-            error_str = str(e)
-            
-            # Check if it's a quota exceeded error
-            if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
-                quota_exceeded = True
-                summaries.append("OpenAI API quota exceeded. Unable to process comments.")
-                continue
-                
-            # For other errors, retry once after delay
-            time.sleep(60)  # Wait for 60 seconds
-            try:
-                # Retry the current batch
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "Summarize the following comments while keeping the detailed context."},
-                        {"role": "user", "content": " ".join(batch)}
-                    ]
-                )
-                summaries.append(response.choices[0].message.content)
-            except Exception as retry_error:
-                print(f"Retry failed: {retry_error}")
-                summaries.append("Failed to summarize comments due to API errors.")
+        return "Comments summary unavailable: OpenAI API is not configured."
+    
+    # Failure messages can't be merged, pass them on for create_final_summary to catch
+    for summary in new_summaries:
+        if "OpenAI API quota exceeded" in summary or "API errors" in summary or "unavailable" in summary:
+            return summary
+    
+    try:
+        return chat_completion(client, [
+            {"role": "system", "content": MERGE_SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{previous_summary}\n\nNew comments:\n" + "\n\n".join(new_summaries)}
+        ])
+    except Exception as e:
+        print(f"Error merging comment summaries: {e}")
+        
+        # Check if it's a quota exceeded error
+        if is_quota_error(e):
+            return "OpenAI API quota exceeded. Unable to process comments."
+        
+        return "Failed to summarize comments due to API errors."
 
-    return summaries
+def create_final_summary(summaries, transcript_summary, on_delta=None):
+    """Create a final summary from comment summaries and transcript summary.
 
-def create_final_summary(summaries, transcript_summary):
-    """Create a final summary from comment summaries and transcript summary."""
+    If `on_delta` is given the reply is streamed and `on_delta(text)` is
+    called for each piece as it arrives.
+    """
     # Check if OpenAI client is initialized
     if not openai_client_initialized or client is None:
         return "Analysis unavailable: OpenAI API is not configured."
@@ -293,75 +446,41 @@ def create_final_summary(summaries, transcript_summary):
         
     summary_text = " ".join(summaries)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
-                {"role": "user", "content": summary_text}
-            ]
-        )
-        return response.choices[0].message.content
+        messages = [
+            {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
+            {"role": "user", "content": summary_text}
+        ]
+        if on_delta is not None:
+            return chat_completion_stream(client, messages, on_delta)
+        return chat_completion(client, messages)
     except Exception as e:
         print(f"Error in final summary: {e}")
-        error_str = str(e)
         
         # Check if it's a quota exceeded error
-        if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
+        if is_quota_error(e):
             return "Unable to generate analysis: OpenAI API quota exceeded. Please check your API key and billing details."
             
-        # For other errors, retry once after delay
-        time.sleep(60)  # Wait for 60 seconds before retrying
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
-                    {"role": "user", "content": summary_text}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as retry_error:
-            print(f"Retry failed: {retry_error}")
-            return "Unable to generate final analysis due to API errors. Please try again later."
+        return "Unable to generate final analysis due to API errors. Please try again later."
 
-def analyze_sentiment(comments):
-    """Analyze the sentiment of comments."""
-    if not comments:
-        return {
-            'positive': 0,
-            'negative': 0,
-            'neutral': 0
-        }
-    
-    # For now, return random distribution for comments
-    # This avoids initializing the heavy sentiment analyzer on import
+def count_sentiment(comments):
+    """Count positive, negative and neutral comments."""
     sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
     
-    # Simple heuristic-based sentiment (no model loading)
-    for comment in comments:
-        comment_lower = comment.lower()
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'love', 'thanks', 'helpful', 'wonderful']
-        negative_words = ['bad', 'terrible', 'hate', 'awful', 'worst', 'disappointing', 'poor', 'useless']
-        
-        has_positive = any(word in comment_lower for word in positive_words)
-        has_negative = any(word in comment_lower for word in negative_words)
-        
-        if has_positive and not has_negative:
-            sentiment_counts['positive'] += 1
-        elif has_negative and not has_positive:
-            sentiment_counts['negative'] += 1
-        else:
-            sentiment_counts['neutral'] += 1
+    # Lexicon-based sentiment (no model loading), scored in one pass
+    for label in get_lexicon_engine().classify(comments):
+        sentiment_counts[label] += 1
     
-    # Calculate percentages
+    return sentiment_counts
+
+def sentiment_percentages(sentiment_counts):
+    """Turn sentiment counts into percentages."""
     total = sum(sentiment_counts.values())
     if total > 0:
-        sentiment_percentages = {
+        return {
             'positive': (sentiment_counts['positive'] / total) * 100,
             'negative': (sentiment_counts['negative'] / total) * 100,
             'neutral': (sentiment_counts['neutral'] / total) * 100
         }
-        return sentiment_percentages
     else:
         return {
             'positive': 0,
@@ -369,80 +488,656 @@ def analyze_sentiment(comments):
             'neutral': 0
         }
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze():
-    data = request.json
+def analyze_sentiment(comments):
+    """Analyze the sentiment of comments."""
+    return sentiment_percentages(count_sentiment(comments))
+
+def estimated_video_quota(sampling=None, replies=None):
+    """YouTube quota units one video's analysis is expected to use (its comment pages and reply calls)."""
+    return get_sampler(sampling).page_budget() + (max_reply_calls() if replies_enabled(replies) else 0)
+
+def analysis_quota(video_info=None, sampling=None, replies=None):
+    """YouTube quota units to reserve for one analysis (comment pages, plus videos.list unless prefetched)."""
+    return estimated_video_quota(sampling, replies) + (0 if video_info else 1)
+
+class VideoNotFoundError(Exception):
+    """Raised by the pipeline when the requested video does not exist."""
+
+def run_analysis(video_id, on_stage_done=None, on_summary_delta=None, incremental=True, video_info=None,
+                 sampling=None, replies=None):
+    """Run the full analysis pipeline for a video.
+
+    Fetching, summarisation and sentiment run as a dependency graph, so
+    video info, comments and transcript are fetched at the same time and
+    the summaries and sentiment overlap. LLM stages wait for the video info
+    so nothing is spent on a video that does not exist.
+
+    With `incremental`, a video analysed before with the same sampling
+    strategy and replies setting only has its new comments fetched (stopping at the first one already seen) and summarised; that
+    summary is merged into the stored one and the stored sentiment counts
+    are updated.
+
+    Comments are ingested page by page as they are fetched (see
+    services.comment_stream): near-duplicates are collapsed, each page is
+    scored, and comment batches are summarised as soon as they fill up, so
+    fetching overlaps with summarisation. Each duplicate group's
+    representative is sent once with its count and weighs that many
+    comments in the sentiment.
+
+    Which comments are read is up to the `sampling` strategy (default
+    COMMENT_SAMPLING, see services.comment_sampling), within its page,
+    comment and token budgets. Refreshes always read new comments newest
+    first. With `replies` (default COMMENT_REPLIES), the sampled threads'
+    replies are analysed too (see services.comment_replies).
+
+    `video_info` can be passed when it was already fetched (e.g. in bulk
+    for a batch), saving the videos.list request.
+
+    The YouTube quota the analysis may need is reserved before any stage
+    starts; QuotaExhaustedError is raised if today's quota can't cover it.
+
+    `on_stage_done(name, result, total_stages)` is called as each stage
+    finishes, and `on_summary_delta(text)` streams the final summary as it
+    is generated. Returns the results dict, or None if the video does not
+    exist.
+    """
+    def load_previous():
+        if not incremental:
+            return None
+        try:
+            # State built with other options would mix two samples, so
+            # those videos are analysed in full instead
+            return get_video_state_store().get(video_id, options)
+        except Exception as e:
+            print(f"Error reading video state: {e}")
+            return None
+
+    prefetched_info = video_info
+    options = result_options(sampling, replies)
+
+    # Comment batches are summarised while later pages are still being
+    # fetched, but nothing is sent before the video is known to exist
+    video_checked = threading.Event()
+    cancel_summaries = threading.Event()
+    quota_exceeded = threading.Event()
+
+    def fetch_video_info():
+        try:
+            info = prefetched_info or get_video_info(video_id)
+            if not info:
+                raise VideoNotFoundError(video_id)
+            return info
+        except Exception:
+            cancel_summaries.set()
+            raise
+        finally:
+            video_checked.set()
+
+    def summarize_batch(batch):
+        video_checked.wait()
+        if cancel_summaries.is_set():
+            return None
+        return summarize_comment_batch(batch, quota_exceeded)
+
+    # Seeded by the video so re-analyses sample the same comments (and can
+    # reuse cached completions)
+    sampler = get_sampler(sampling, seed=video_id)
+    reply_fetcher = get_reply_fetcher(fetch_comment_replies) if replies_enabled(replies) else None
+
+    def ingest_comments(previous):
+        nonlocal sampler
+        openai_ready = openai_client_initialized and client is not None
+        ingest = CommentIngest(summarize_batch if openai_ready else None, max_workers=OPENAI_MAX_CONCURRENCY)
+        with_replies = reply_fetcher is not None
+        if previous is None:
+            pages = iter_comment_pages(video_id, max_comments=None, order=sampler.order, replies=with_replies)
+        else:
+            if sampler.order != 'time':
+                sampler = get_sampler('recent', seed=video_id)
+            pages = iter_comment_pages(video_id, known_ids=previous.seen_ids, since=previous.newest_published_at,
+                                       max_comments=None, replies=with_replies)
+        pages = sampler.sample(pages)
+        if with_replies:
+            pages = reply_fetcher.expand(pages)
+        ingest.consume(pages)
+        if isinstance(ingest.error, QuotaExhaustedError):
+            cancel_summaries.set()
+            ingest.finish()
+            raise ingest.error
+        if ingest.error is not None:
+            # A refresh serves what we already have; comments fetched before
+            # the error are still used, but not remembered as seen
+            print(f"Error fetching comments: {ingest.error}")
+        if previous is None and not ingest.records:
+            # Provide some sample comments for testing if the API fails
+            ingest.add_page(sample_comment_records(SAMPLE_COMMENTS if ingest.error else [NO_COMMENTS]))
+        return ingest.finish()
+
+    def summarize_video_transcript(video_info, segments):
+        return get_transcript_summary(segments if segments else transcript_text(segments))
+
+    def summarize_comments(video_info, previous, ingest):
+        if previous is not None and not ingest.groups:
+            return [previous.comment_summary]
+        if not openai_client_initialized or client is None:
+            return ["Comments summary unavailable: OpenAI API is not configured."]
+        new_summaries = collect_comment_summaries(ingest.summaries(), quota_exceeded)
+        if previous is None:
+            return new_summaries
+        return [merge_comment_summaries(previous.comment_summary, new_summaries)]
+
+    def count_comment_sentiment(previous, ingest):
+        sentiment_counts = dict(ingest.sentiment_counts)
+        if previous is not None:
+            for label, count in previous.sentiment_counts.items():
+                sentiment_counts[label] = sentiment_counts.get(label, 0) + count
+        return sentiment_counts
+
+    def summarize_all(comment_summaries, transcript_summary):
+        return create_final_summary(comment_summaries, transcript_summary, on_delta=on_summary_delta)
+
+    stages = [
+        Stage('previous', load_previous),
+        Stage('video_info', fetch_video_info),
+        Stage('comments', ingest_comments, deps=('previous',)),
+        Stage('transcript', lambda: get_transcript_segments(video_id)),
+        Stage('transcript_summary', summarize_video_transcript, deps=('video_info', 'transcript')),
+        Stage('comment_summaries', summarize_comments, deps=('video_info', 'previous', 'comments')),
+        Stage('sentiment', count_comment_sentiment, deps=('previous', 'comments')),
+        Stage('final_summary', summarize_all, deps=('comment_summaries', 'transcript_summary')),
+    ]
+
+    def stage_done(name, result):
+        if on_stage_done is not None:
+            on_stage_done(name, result, len(stages))
+    
+    budget = get_quota_budget()
+    units = analysis_quota(video_info, sampling, replies)
+    reservation = budget.reserve(units) if budget.keys else contextlib.nullcontext()
+    try:
+        # Retries anywhere in the pipeline give up rather than overrun this
+        with reservation, deadline_scope(ANALYSIS_DEADLINE_SECONDS):
+            stage_results = run_stages(stages, max_workers=PIPELINE_MAX_WORKERS, on_stage_done=stage_done)
+    except VideoNotFoundError:
+        return None
+    
+    video_info = stage_results['video_info']
+    transcript_summary = stage_results['transcript_summary']
+    comment_summaries = stage_results['comment_summaries']
+    sentiment_counts = stage_results['sentiment']
+    quota_error, comments_failed = summary_failures(transcript_summary, comment_summaries)
+    
+    # Remember what this analysis covered so the next one can be incremental.
+    # Sample comments used when the API failed, and comments from a fetch
+    # that failed part-way, are never remembered.
+    ingest = stage_results['comments']
+    comments = ingest.records
+    if not comments_failed and ingest.complete and all(c['id'] for c in comments):
+        try:
+            get_video_state_store().save(
+                video_id,
+                comments,
+                "\n\n".join(comment_summaries),
+                sentiment_counts,
+                sum(sentiment_counts.values()),
+                replace=stage_results['previous'] is None,
+                options=options
+            )
+        except Exception as e:
+            print(f"Error saving video state: {e}")
+    
+    return analysis_results(
+        video_id, video_info, sentiment_counts, stage_results['final_summary'], transcript_summary,
+        dict(sampler.stats(), **(reply_fetcher.stats() if reply_fetcher else {})), quota_error
+    )
+
+def summary_failures(transcript_summary, comment_summaries):
+    """(quota_error, comments_failed) for an analysis's summaries.
+
+    quota_error is set when any summary hit the OpenAI quota, comments_failed
+    when the comment summaries are error or placeholder text.
+    """
+    quota_error = "OpenAI API quota exceeded" in transcript_summary
+    comments_failed = False
+    for summary in comment_summaries:
+        if "OpenAI API quota exceeded" in summary:
+            quota_error = True
+        if "OpenAI API quota exceeded" in summary or "API errors" in summary or "unavailable" in summary:
+            comments_failed = True
+    return quota_error, comments_failed
+
+def analysis_results(video_id, video_info, sentiment_counts, summary, transcript_summary, sampling_stats,
+                     quota_error=False):
+    """The results dict returned by /api/analyze (and stored for /api/results)."""
+    return {
+        'videoId': video_id,
+        'videoTitle': video_info['title'],
+        'channelTitle': video_info['channelTitle'],
+        'commentCount': sum(sentiment_counts.values()),
+        'sentiment': sentiment_percentages(sentiment_counts),
+        'summary': summary,
+        'transcriptSummary': transcript_summary,
+        'sampling': sampling_stats,
+        'apiQuotaExceeded': quota_error
+    }
+
+def result_options(sampling=None, replies=None):
+    """The options a stored result depends on, with defaults filled in."""
+    return {'sampling': sampling_strategy(sampling), 'replies': replies_enabled(replies)}
+
+def store_results(video_id, results, sampling=None, replies=None):
+    """Persist results so /api/results can serve them without re-running the pipeline.
+
+    Results are stored per sampling strategy and replies setting, those the
+    analysis was asked to run with.
+    """
+    # Don't keep degraded results around, the next request should try again
+    if results.get('apiQuotaExceeded'):
+        return
+    try:
+        get_result_store().put(video_id, results, result_options(sampling, replies))
+    except Exception as e:
+        print(f"Error storing results: {e}")
+
+def youtube_quota_response(message=None):
+    """429 response for when the YouTube quota is used up for today."""
+    response = jsonify({
+        'error': message or 'YouTube API quota exhausted for today. Please try again after it resets.',
+        'apiQuotaExceeded': True
+    })
+    response.headers['Retry-After'] = str(seconds_until_reset())
+    return response, 429
+
+def check_youtube_quota(units):
+    """Return a 429 response if today's YouTube quota can't cover `units`, else None.
+
+    Lets requests be turned away before anything is started; run_analysis
+    still reserves the units itself.
+    """
+    budget = get_quota_budget()
+    if budget.keys and budget.available() < units:
+        return youtube_quota_response()
+    return None
+
+def analysis_error_response(e):
+    """Build the error response for a failed analysis."""
+    print(f"Error processing request: {e}")
+    error_msg = str(e)
+    
+    if isinstance(e, QuotaExhaustedError):
+        return youtube_quota_response()
     
+    if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
+        return jsonify({
+            'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
+            'apiQuotaExceeded': True
+        }), 429
+    
+    return jsonify({'error': 'Failed to process video'}), 500
+
+def run_analysis_job(job):
+    """Run one background analysis job and store its result.
+
+    `job.options` holds the run_analysis() keyword arguments, plus
+    `bypassCache`.
+    """
+    options = dict(job.options)
+    fresh = options.pop('bypassCache', False)
+    try:
+        with bypass_cache(fresh):
+            results = run_analysis(job.video_id, on_stage_done=lambda name, result, total: job.stage_done(name, total),
+                                   **options)
+    except Exception as e:
+        if isinstance(e, QuotaExhaustedError):
+            job.error = 'YouTube API quota exhausted for today. Please try again after it resets.'
+        elif is_quota_error(e):
+            job.error = 'OpenAI API quota exceeded. Please check your API key and billing details.'
+        else:
+            job.error = 'Failed to process video'
+        raise
+    if results is None:
+        job.error = 'Video not found'
+        raise VideoNotFoundError(job.video_id)
+    store_results(job.video_id, results, options.get('sampling'), options.get('replies'))
+    return results
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Lazily create the background job manager."""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = JobManager(
+                    run_analysis_job,
+                    get_job_store(),
+                    max_workers=ANALYSIS_WORKERS,
+                    retention=JOB_RETENTION_SECONDS
+                )
+    return _job_manager
+
+def video_id_from_request(data):
+    """Pick the video ID out of request data. Returns (video_id, error_response)."""
     # Check if URL or video ID is provided
-    if 'url' in data:
+    if data.get('url'):
         video_id = extract_video_id(data['url'])
-    elif 'videoId' in data:
+    elif data.get('videoId'):
         video_id = data['videoId']
     else:
-        return jsonify({'error': 'No URL or video ID provided'}), 400
+        return None, (jsonify({'error': 'No URL or video ID provided'}), 400)
     
     if not video_id:
-        return jsonify({'error': 'Invalid YouTube URL or video ID'}), 400
+        return None, (jsonify({'error': 'Invalid YouTube URL or video ID'}), 400)
+    return video_id, None
+
+def sampling_from_request(data):
+    """The comment sampling strategy asked for, if any. Returns (sampling, error_response)."""
+    sampling = data.get('sampling') or None
+    if sampling is not None and sampling not in STRATEGIES:
+        return None, (jsonify({'error': f"Unknown sampling strategy, use one of: {', '.join(STRATEGIES)}"}), 400)
+    return sampling, None
+
+def flag_from_request(data, name, default=None):
+    """A boolean request field, from JSON or a query string ("0", "false" and "no" are false)."""
+    value = data.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return value.lower() not in ('0', 'false', 'no')
+    return bool(value)
+
+def replies_from_request(data):
+    """The request's "replies" choice (True, False or None for the default)."""
+    return flag_from_request(data, 'replies')
+
+def results_response(results):
+    """JSON response for analysis results, timing the serialisation."""
+    with timed(SERIALIZATION_SECONDS, 'serialize', endpoint=request.endpoint):
+        return jsonify(results)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# What the stream sends when each pipeline stage finishes
+STREAMED_STAGES = {
+    'video_info': lambda video_info: {'videoTitle': video_info['title'], 'channelTitle': video_info['channelTitle']},
+    'sentiment': lambda counts: {'sentiment': sentiment_percentages(counts), 'commentCount': sum(counts.values())},
+    'transcript_summary': lambda summary: {'transcriptSummary': summary},
+    'comment_summaries': lambda summaries: {'commentSummaries': summaries},
+}
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze():
+    data = request.json or {}
+    
+    video_id, error = video_id_from_request(data)
+    if error:
+        return error
+    
+    # "bypassCache": true re-runs every OpenAI call instead of reusing cached completions
+    fresh = flag_from_request(data, 'bypassCache', False)
+    
+    sampling, error = sampling_from_request(data)
+    if error:
+        return error
+    replies = replies_from_request(data)
+    
+    quota_error = check_youtube_quota(analysis_quota(sampling=sampling, replies=replies))
+    if quota_error:
+        return quota_error
+    
+    # Job mode: answer right away and let the client poll /api/jobs/<jobId>
+    incremental = flag_from_request(data, 'incremental', True)
+    if flag_from_request(data, 'async', False):
+        job, created = get_job_manager().submit(video_id, {
+            'incremental': incremental,
+            'sampling': sampling,
+            'replies': replies,
+            'bypassCache': fresh
+        })
+        return jsonify(job.to_dict()), 202 if created else 200
     
     try:
-        # Get video information
-        video_info = get_video_info(video_id)
-        if not video_info:
+        with bypass_cache(fresh):
+            results = run_analysis(video_id, incremental=incremental, sampling=sampling, replies=replies)
+        if results is None:
             return jsonify({'error': 'Video not found'}), 404
         
-        # Get comments
-        comments = get_comments(video_id)
-        
-        # Get transcript and summary
-        transcript = get_transcript(video_id)
-        transcript_summary = get_transcript_summary(transcript)
-        
-        # Check if there was an API quota error with transcript summary
-        quota_error = False
-        if "OpenAI API quota exceeded" in transcript_summary:
-            quota_error = True
-        
-        # Batch comments and get summaries
-        comment_batches = batch_comments(comments)
-        comment_summaries = get_comments_summaries(comment_batches)
-        
-        # Check if there was an API quota error with comment summaries
-        for summary in comment_summaries:
-            if "OpenAI API quota exceeded" in summary:
-                quota_error = True
-                break
-        
-        # Create final summary
-        final_summary = create_final_summary(comment_summaries, transcript_summary)
-        
-        # Analyze sentiment
-        sentiment_counts = analyze_sentiment(comments)
-        
-        # Prepare results
-        results = {
-            'videoId': video_id,
-            'videoTitle': video_info['title'],
-            'channelTitle': video_info['channelTitle'],
-            'commentCount': len(comments),
-            'sentiment': sentiment_counts,
-            'summary': final_summary,
-            'transcriptSummary': transcript_summary,
-            'apiQuotaExceeded': quota_error
-        }
-        
-        return jsonify(results)
+        store_results(video_id, results, sampling, replies)
+        return results_response(results)
         
     except Exception as e:
-        print(f"Error processing request: {e}")
-        error_msg = str(e)
-        
-        if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
-            return jsonify({
-                'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
-                'apiQuotaExceeded': True
-            }), 429
-        
-        return jsonify({'error': 'Failed to process video'}), 500
+        return analysis_error_response(e)
+
+@app.route('/api/analyze/stream', methods=['GET', 'POST'])
+def analyze_stream():
+    """Run an analysis and stream each stage's output as Server-Sent Events.
+
+    Events: one per finished stage (see STREAMED_STAGES), `summary_delta`
+    for each piece of the final summary, then `result` with the same body
+    as /api/analyze, or `error`.
+    """
+    data = request.get_json(silent=True) or request.args
+    video_id, error = video_id_from_request(data)
+    if error:
+        return error
+
+    incremental = flag_from_request(data, 'incremental', True)
+    sampling, error = sampling_from_request(data)
+    if error:
+        return error
+    replies = replies_from_request(data)
+    quota_error = check_youtube_quota(analysis_quota(sampling=sampling, replies=replies))
+    if quota_error:
+        return quota_error
+    events = queue.Queue()
+
+    def stage_done(name, result, total_stages):
+        if name in STREAMED_STAGES:
+            events.put(sse_event(name, dict(STREAMED_STAGES[name](result), videoId=video_id)))
+
+    def summary_delta(text):
+        events.put(sse_event('summary_delta', {'delta': text}))
+
+    def worker():
+        try:
+            results = run_analysis(video_id, on_stage_done=stage_done, on_summary_delta=summary_delta,
+                                   incremental=incremental, sampling=sampling, replies=replies)
+            if results is None:
+                events.put(sse_event('error', {'error': 'Video not found', 'status': 404}))
+            else:
+                store_results(video_id, results, sampling, replies)
+                events.put(sse_event('result', results))
+        except Exception as e:
+            print(f"Error processing request: {e}")
+            if isinstance(e, QuotaExhaustedError):
+                events.put(sse_event('error', {
+                    'error': 'YouTube API quota exhausted for today. Please try again after it resets.',
+                    'apiQuotaExceeded': True,
+                    'status': 429
+                }))
+            elif is_quota_error(e):
+                events.put(sse_event('error', {
+                    'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
+                    'apiQuotaExceeded': True,
+                    'status': 429
+                }))
+            else:
+                events.put(sse_event('error', {'error': 'Failed to process video', 'status': 500}))
+        finally:
+            events.put(None)
+
+    # The analysis keeps running (and its result is stored) if the client goes away
+    with bypass_cache(flag_from_request(data, 'bypassCache', False)):
+        ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(worker,), daemon=True).start()
+
+    def generate():
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def resolve_batch_videos(data, max_videos):
+    """Video IDs to analyse for a batch request.
+
+    Returns (video_ids, invalid_inputs, error_response).
+    """
+    urls = data.get('urls')
+    if urls:
+        if not isinstance(urls, list) or not all(isinstance(value, str) for value in urls):
+            return None, [], (jsonify({'error': 'urls must be a list of strings'}), 400)
+        video_ids = []
+        invalid = []
+        # Only the first max_videos inputs are looked at
+        for value in urls[:max_videos]:
+            value = value.strip()
+            video_id = extract_video_id(value) or (value if VIDEO_ID_RE.fullmatch(value) else None)
+            if video_id is None:
+                invalid.append(value)
+            elif video_id not in video_ids:
+                video_ids.append(video_id)
+        return video_ids, invalid, None
+    if data.get('playlistId'):
+        return get_playlist_video_ids(data['playlistId'], max_videos), [], None
+    if data.get('channelId'):
+        video_ids = get_channel_video_ids(data['channelId'], max_videos)
+        if video_ids is None:
+            return None, [], (jsonify({'error': 'Channel not found'}), 404)
+        return video_ids, [], None
+    return None, [], (jsonify({'error': 'Provide urls, playlistId or channelId'}), 400)
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyse many videos (a list of URLs, a playlist or a channel's uploads).
+
+    Metadata is fetched 50 videos per request, then up to BATCH_CONCURRENCY
+    analyses run at once and each result is streamed as a Server-Sent
+    Event as soon as its video finishes: `videos` (what will be analysed),
+    then `video_result` or `video_error` per video, then `done`.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        max_videos = data.get('maxVideos')
+        max_videos = BATCH_MAX_VIDEOS if max_videos is None else max(1, min(int(max_videos), BATCH_MAX_VIDEOS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'maxVideos must be a whole number'}), 400
+    incremental = flag_from_request(data, 'incremental', True)
+    sampling, error = sampling_from_request(data)
+    if error:
+        return error
+    replies = replies_from_request(data)
+
+    # Enough for the lookups and at least one video
+    quota_error = check_youtube_quota(analysis_quota(sampling=sampling, replies=replies))
+    if quota_error:
+        return quota_error
+
+    try:
+        video_ids, invalid, error = resolve_batch_videos(data, max_videos)
+        if error:
+            return error
+        infos = get_videos_info(video_ids) if video_ids else {}
+    except Exception as e:
+        print(f"Error resolving batch: {e}")
+        if is_quota_error(e):
+            return youtube_quota_response()
+        return jsonify({'error': 'Failed to resolve videos'}), 500
+
+    not_found = [video_id for video_id in video_ids if video_id not in infos]
+    found = [video_id for video_id in video_ids if video_id in infos]
+    # Don't start more videos than the batch's quota budget (or what is
+    # left of today's quota) covers
+    budget = get_quota_budget()
+    units = min(BATCH_QUOTA_UNITS, budget.available()) if budget.keys else BATCH_QUOTA_UNITS
+    affordable = max(0, units // max(1, estimated_video_quota(sampling, replies)))
+    to_run, over_budget = found[:affordable], found[affordable:]
+
+    events = queue.Queue()
+    quota_exceeded = threading.Event()
+    counts = {'completed': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    def video_error(video_id, message, status, **extra):
+        with counts_lock:
+            counts['failed'] += 1
+        events.put(sse_event('video_error', dict(extra, videoId=video_id, error=message, status=status)))
+
+    def analyse(video_id):
+        if quota_exceeded.is_set():
+            return
+        try:
+            results = run_analysis(video_id, incremental=incremental, video_info=infos[video_id], sampling=sampling,
+                                   replies=replies)
+        except Exception as e:
+            print(f"Error processing {video_id}: {e}")
+            if is_quota_error(e):
+                quota_exceeded.set()
+                video_error(video_id, 'API quota exceeded', 429, apiQuotaExceeded=True)
+            else:
+                video_error(video_id, 'Failed to process video', 500)
+            return
+        if results is None:
+            video_error(video_id, 'Video not found', 404)
+            return
+        store_results(video_id, results, sampling, replies)
+        if results.get('apiQuotaExceeded'):
+            quota_exceeded.set()
+        with counts_lock:
+            counts['completed'] += 1
+        events.put(sse_event('video_result', results))
+
+    def worker():
+        try:
+            events.put(sse_event('videos', {
+                'videos': [dict(videoId=video_id, videoTitle=infos[video_id]['title'],
+                                channelTitle=infos[video_id]['channelTitle']) for video_id in to_run],
+                'notFound': not_found,
+                'invalid': invalid,
+                'overBudget': over_budget
+            }))
+            map_concurrently(analyse, to_run, max_workers=BATCH_CONCURRENCY, stop_event=quota_exceeded)
+            # Videos never started once a quota ran out
+            skipped = len(to_run) - counts['completed'] - counts['failed']
+            events.put(sse_event('done', dict(counts, skipped=skipped + len(over_budget),
+                                              notFound=len(not_found), apiQuotaExceeded=quota_exceeded.is_set())))
+        except Exception as e:
+            print(f"Error processing batch: {e}")
+            events.put(sse_event('error', {'error': 'Failed to process batch', 'status': 500}))
+        finally:
+            events.put(None)
+
+    with bypass_cache(flag_from_request(data, 'bypassCache', False)):
+        ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(worker,), daemon=True).start()
+
+    def generate():
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
@@ -451,70 +1146,86 @@ def get_results():
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
     
+    sampling, error = sampling_from_request(request.args)
+    if error:
+        return error
+    replies = replies_from_request(request.args)
+    
+    # Serve the stored result of an earlier analysis with the same options when we have one
     try:
-        # Get video information
-        video_info = get_video_info(video_id)
-        if not video_info:
+        stored = get_result_store().get(video_id, result_options(sampling, replies))
+    except Exception as e:
+        print(f"Error reading stored results: {e}")
+        stored = None
+    if stored is not None:
+        return results_response(stored)
+    
+    quota_error = check_youtube_quota(analysis_quota(sampling=sampling, replies=replies))
+    if quota_error:
+        return quota_error
+    
+    try:
+        results = run_analysis(video_id, sampling=sampling, replies=replies)
+        if results is None:
             return jsonify({'error': 'Video not found'}), 404
         
-        # Get comments
-        comments = get_comments(video_id)
-        
-        # Get transcript and summary
-        transcript = get_transcript(video_id)
-        transcript_summary = get_transcript_summary(transcript)
-        
-        # Check if there was an API quota error with transcript summary
-        quota_error = False
-        if "OpenAI API quota exceeded" in transcript_summary:
-            quota_error = True
-        
-        # Batch comments and get summaries
-        comment_batches = batch_comments(comments)
-        comment_summaries = get_comments_summaries(comment_batches)
-        
-        # Check if there was an API quota error with comment summaries
-        for summary in comment_summaries:
-            if "OpenAI API quota exceeded" in summary:
-                quota_error = True
-                break
-        
-        # Create final summary
-        final_summary = create_final_summary(comment_summaries, transcript_summary)
-        
-        # Analyze sentiment
-        sentiment_counts = analyze_sentiment(comments)
-        
-        # Prepare results
-        results = {
-            'videoId': video_id,
-            'videoTitle': video_info['title'],
-            'channelTitle': video_info['channelTitle'],
-            'commentCount': len(comments),
-            'sentiment': sentiment_counts,
-            'summary': final_summary,
-            'transcriptSummary': transcript_summary,
-            'apiQuotaExceeded': quota_error
-        }
-        
-        return jsonify(results)
+        store_results(video_id, results, sampling, replies)
+        return results_response(results)
         
     except Exception as e:
-        print(f"Error processing request: {e}")
-        error_msg = str(e)
-        
-        if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
-            return jsonify({
-                'error': 'OpenAI API quota exceeded. Please check your API key and billing details.',
-                'apiQuotaExceeded': True
-            }), 429
-        
-        return jsonify({'error': 'Failed to process video'}), 500
+        return analysis_error_response(e)
+
+@app.route('/api/transcript', methods=['GET'])
+def get_transcript_range():
+    """Timed caption segments of a video, optionally only those between `start` and `end`."""
+    video_id = request.args.get('videoId')
+
+    if not video_id:
+        return jsonify({'error': 'No video ID provided'}), 400
+
+    try:
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start/end must be m:ss or seconds'}), 400
+
+    segments = get_transcript_segments(video_id, start, end)
+    if segments is None:
+        return jsonify({'error': 'Transcript not available'}), 404
+
+    return jsonify({
+        'videoId': video_id,
+        'segments': [dict(segment, timestamp=format_timestamp(segment['start'])) for segment in segments]
+    })
 
 @app.before_request
 def log_request():
     print(f"REQUEST: {request.method} {request.path}", flush=True)
 
+@app.before_request
+def start_request_timing():
+    start_request()
+
+@app.after_request
+def record_request_timing(response):
+    # Per-step breakdown for this request (pipeline stages, OpenAI and
+    # YouTube calls, serialisation). Streamed responses only cover setup.
+    timings = request_timings()
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+        HTTP_REQUEST_SECONDS.observe(
+            timings.elapsed(),
+            method=request.method,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=response.status_code
+        )
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: stage, OpenAI and YouTube latencies, tokens, cost, cache and quota use."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/', methods=['GET'])
 def home():
     print("DEBUG: Home endpoint called", flush=True)
@@ -532,7 +1243,12 @@ def home():
 def health():
     print("DEBUG: Health endpoint called", flush=True)
     try:
-        result = {'status': 'healthy', 'api_keys_loaded': bool(YOUTUBE_API_KEY and OPENAI_API_KEY)}
+        budget = get_quota_budget()
+        result = {'status': 'healthy', 'api_keys_loaded': bool(budget.keys and OPENAI_API_KEY),
+                  'youtubeQuota': budget.stats()}
+        cache = get_completion_cache()
+        if cache is not None:
+            result['completionCache'] = cache.stats()
         print(f"DEBUG: Returning health: {result}", flush=True)
         return jsonify(result), 200
     except Exception as e:
@@ -553,5 +1269,7 @@ if __name__ == '__main__':
         debug=False,
         use_debugger=False,
         use_reloader=False,
-        threaded=False
+        # Handle requests on separate threads so one slow analysis
+        # (or a retry backoff) doesn't block every other request
+        threaded=True
     )
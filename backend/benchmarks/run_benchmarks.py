@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# Backend Benchmarks
+# Times the pipeline's pure-Python hot paths on synthetic comment corpora
+# of increasing size, records wall time and peak memory, and compares them
+# with a stored baseline so regressions fail the run.
+#
+#   python benchmarks/run_benchmarks.py                 # compare with baseline
+#   python benchmarks/run_benchmarks.py --save          # record a new baseline
+#   python benchmarks/run_benchmarks.py --require-baseline   # fail without one (default under CI)
+#   python benchmarks/run_benchmarks.py --sizes 100,1000 --only sentiment_lexicon
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_SIZES = [100, 1000, 10000, 100000, 1000000]
+
+WORDS = ("the a this video is was really so great good bad love hate audio music editing part "
+         "explanation thanks not never why how what when first watching from channel more please "
+         "terrible amazing helpful useless boring best worst interesting clear confusing").split()
+DUPLICATES = ["First!", "first", "Who's here in 2024?", "Like if you're watching this",
+              "Check out my channel for free giveaways!!"]
+
+def synthetic_comments(n, seed=0):
+    """n comments with a realistic spread of lengths and ~15% common duplicates."""
+    rnd = random.Random(seed)
+    comments = []
+    for _ in range(n):
+        if rnd.random() < 0.15:
+            comments.append(rnd.choice(DUPLICATES))
+        else:
+            length = min(300, int(rnd.paretovariate(1.5) * 6))
+            comments.append(" ".join(rnd.choices(WORDS, k=length)))
+    return comments
+
+def synthetic_urls(n, seed=0):
+    rnd = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+    forms = ["https://www.youtube.com/watch?v={}", "https://youtu.be/{}",
+             "https://www.youtube.com/embed/{}", "https://m.youtube.com/watch?feature=share&v={}&t=42",
+             "not a youtube url {}"]
+    return [rnd.choice(forms).format("".join(rnd.choices(alphabet, k=11))) for _ in range(n)]
+
+def bench_batch_comments(size):
+    from services.comment_batching import batch_comments
+    comments = synthetic_comments(size)
+    return lambda: batch_comments(comments)
+
+def bench_sentiment_lexicon(size):
+    import app
+    comments = synthetic_comments(size)
+    return lambda: app.analyze_sentiment(comments)
+
+def bench_sentiment_transformer(size):
+    # Needs the ML stack from requirements.txt
+    from services.sentiment_service import analyze_sentiment
+    comments = synthetic_comments(size)
+    return lambda: analyze_sentiment(comments)
+
+def bench_dedup(size):
+    from services.dedup import collapse_duplicates
+    comments = synthetic_comments(size)
+    return lambda: collapse_duplicates(comments)
+
+def bench_extract_video_id(size):
+    import app
+    urls = synthetic_urls(size)
+    return lambda: [app.extract_video_id(url) for url in urls]
+
+def bench_result_json(size):
+    import app
+    comments = synthetic_comments(size)
+    counts = app.count_sentiment(comments)
+    # Roughly one summary per 50 comments, as streamed in comment_summaries
+    summaries = [" ".join(comments[i:i + 20])[:1500] for i in range(0, size, 50)]
+    video_info = {'title': 'Benchmark video', 'channelTitle': 'Benchmark channel'}
+    sampling_stats = {'strategy': 'top', 'pagesRead': size // 100, 'commentsRead': size, 'commentsUsed': size}
+    # results_response() reads the endpoint from the request
+    app.app.test_request_context('/api/analyze', method='POST').push()
+
+    def assemble():
+        quota_error, _ = app.summary_failures('Transcript summary', summaries)
+        results = app.analysis_results('dQw4w9WgXcQ', video_info, counts, summaries[0] if summaries else '',
+                                       'Transcript summary', sampling_stats, quota_error)
+        return (app.results_response(results).get_data(),
+                app.sse_event('comment_summaries', app.STREAMED_STAGES['comment_summaries'](summaries)))
+
+    return assemble
+
+# name -> (setup(size) returning the timed callable, largest size worth running)
+BENCHMARKS = {
+    'batch_comments': (bench_batch_comments, 1000000),
+    'sentiment_lexicon': (bench_sentiment_lexicon, 1000000),
+    'sentiment_transformer': (bench_sentiment_transformer, 1000),
+    'dedup': (bench_dedup, 100000),
+    'extract_video_id': (bench_extract_video_id, 1000000),
+    'result_json': (bench_result_json, 1000000),
+}
+
+def measure(func, min_time=0.5, max_repeat=20):
+    """Best wall time over several runs (at least one), then peak traced memory of one run."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_repeat:
+        gc.collect()
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started >= min_time:
+            break
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak, 'runs': len(times)}
+
+def run(names, sizes):
+    results = {}
+    for name in names:
+        setup, largest = BENCHMARKS[name]
+        for size in sizes:
+            if size > largest:
+                continue
+            key = f"{name}[{size}]"
+            try:
+                func = setup(size)
+            except ImportError as e:
+                print(f"{key:32} skipped ({e})")
+                break
+            result = measure(func)
+            results[key] = result
+            print(f"{key:32} {result['seconds'] * 1000:12.3f} ms {result['peak_bytes'] / 1024 / 1024:10.2f} MiB"
+                  f"  ({result['runs']} runs)")
+    return results
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Regressions beyond the thresholds, as printable lines."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        # Very short runs are too noisy to compare on time
+        if base['seconds'] >= 0.001 and result['seconds'] > base['seconds'] * (1 + threshold):
+            regressions.append(f"{key}: {base['seconds'] * 1000:.3f} ms -> {result['seconds'] * 1000:.3f} ms")
+        if base['peak_bytes'] >= 64 * 1024 and result['peak_bytes'] > base['peak_bytes'] * (1 + memory_threshold):
+            regressions.append(f"{key}: peak {base['peak_bytes']} -> {result['peak_bytes']} bytes")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend's pure-Python hot paths")
+    parser.add_argument('--sizes', default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated corpus sizes")
+    parser.add_argument('--only', default='', help="comma-separated benchmark names: " + ", ".join(BENCHMARKS))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument('--memory-threshold', type=float, default=0.25,
+                        help="allowed peak memory growth over the baseline")
+    parser.add_argument('--require-baseline', action='store_true', default=bool(os.getenv('CI')),
+                        help="fail when there is no baseline to compare with (the default when CI is set)")
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.only.split(',') if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    results = run(names, sizes)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        message = f"No baseline at {args.baseline}; run with --save to record one"
+        if args.require_baseline:
+            print(f"ERROR: {message}", file=sys.stderr)
+            return 2
+        print(f"WARNING: {message}. Nothing was compared.", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Gunicorn configuration for production serving
+#
+#   cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Workers are threaded (gthread): an analysis spends nearly all its time
+# waiting on the YouTube and OpenAI APIs, so threads keep one slow analysis
+# from blocking other requests, and several processes spread the
+# CPU-bound parts (sentiment, batching, JSON) across cores. The app is
+# preloaded in the master so models and documents are shared copy-on-write.
+#
+# Reloads: with preload_app, SIGHUP restarts workers but does not pick up new
+# code. To deploy new code without dropping requests, send SIGUSR2 (starts a
+# new master and workers alongside the old ones), then SIGTERM the old
+# master once the new one is serving; it finishes in-flight requests for up
+# to graceful_timeout seconds.
+
+import glob
+import multiprocessing
+import os
+import random
+import tempfile
+
+from dotenv import load_dotenv
+
+# Read .env before the settings below (app.py loads it again on import)
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+
+# Processes: defaults to one per core plus one, capped to keep memory in check
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() + 1, 8))))
+worker_class = "gthread"
+# Concurrent requests per worker, mostly waiting on network I/O
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+preload_app = True
+
+# Each worker keeps its own metrics; with a shared directory they are
+# written there and every /metrics scrape adds up all workers (see
+# services.metrics). Must be set before the app is loaded.
+if workers > 1 and not os.getenv("METRICS_MULTIPROC_DIR"):
+    os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="review-metrics-")
+
+# An analysis may legitimately take up to ANALYSIS_DEADLINE_SECONDS
+timeout = int(os.getenv("ANALYSIS_DEADLINE_SECONDS", "300")) + 30
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+def on_starting(server):
+    # Metrics left over from an earlier run would be added to this one's
+    directory = os.getenv("METRICS_MULTIPROC_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "metrics_*.json")):
+            os.remove(path)
+
+def post_fork(server, worker):
+    # Every worker inherits the master's random state; reseed so retry
+    # backoff jitter differs between workers
+    random.seed()
+
+    # OPENAI_RPM / OPENAI_TPM are account-wide, but each worker runs its own
+    # limiter, so give each worker its share (limiters are created lazily)
+    for name in ("OPENAI_RPM", "OPENAI_TPM"):
+        total = int(os.getenv(name, "0"))
+        if total:
+            os.environ[name] = str(max(1, total // server.cfg.workers))
+
+    # SQLite connections (per thread) and the YouTube client pool (per
+    # process) are only opened on first use, so nothing else needs resetting
+    # here as long as wsgi.preload() keeps to read-only state
+
+def worker_exit(server, worker):
+    # Last write of the worker's metrics before it goes
+    from services.metrics import REGISTRY
+    REGISTRY.write()
+
+def child_exit(server, worker):
+    # Keep an exited (e.g. recycled) worker's counts in the totals
+    from services.metrics import REGISTRY
+    REGISTRY.mark_process_dead(worker.pid)
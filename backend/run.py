@@ -18,7 +18,7 @@ if __name__ == '__main__':
             debug=False,
             use_debugger=False,
             use_reloader=False,
-            threaded=False
+            threaded=True
         )
     except KeyboardInterrupt:
         print("\nShutting down...")
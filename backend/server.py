@@ -1,83 +1,218 @@
 #!/usr/bin/env python
 """
 Simple HTTP server for the sentiment analysis backend.
-Uses Python's built-in http.server instead of Flask to avoid compatibility issues.
+Uses Python's built-in http.server, dispatching each request straight to the
+Flask WSGI app on its own thread. Connections are kept alive (HTTP/1.1) and
+responses without a known length, such as the Server-Sent Events stream,
+are sent chunked as they are produced.
 """
-import json
+import io
 import sys
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-# Import the Flask app routes separately
 from app import app
 
-class SimpleHandler(BaseHTTPRequestHandler):
-    """Handle HTTP requests using Flask's test client"""
-    
-    def do_GET(self):
-        """Handle GET requests"""
-        path = urlparse(self.path).path
-        
-        with app.test_client() as client:
-            response = client.get(path)
-            
-        self.send_response(response.status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        
-        self.wfile.write(response.get_data())
-    
-    def do_POST(self):
-        """Handle POST requests"""
-        path = urlparse(self.path).path
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
-        
-        with app.test_client() as client:
-            response = client.post(
-                path,
-                data=body,
-                content_type=self.headers.get('Content-Type', 'application/json')
-            )
-        
-        self.send_response(response.status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        
-        self.wfile.write(response.get_data())
-    
-    def do_OPTIONS(self):
-        """Handle CORS preflight"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-    
+# Statuses that never carry a body
+NO_BODY_STATUSES = {204, 304}
+
+class _BodyReader:
+    """wsgi.input limited to the request body, so keep-alive requests don't bleed together."""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._rfile.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._rfile.readline(size)
+        self._remaining -= len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b''))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def drain(self):
+        """Discard whatever the app left unread."""
+        while self._remaining > 0:
+            if not self.read(min(self._remaining, 65536)):
+                break
+
+class WSGIRequestHandler(BaseHTTPRequestHandler):
+    """Serve each request by calling the WSGI app directly."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "YTSentimentBackend/1.0"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 30
+
+    def _read_chunked_body(self):
+        body = io.BytesIO()
+        while True:
+            size = int(self.rfile.readline().split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            body.write(self.rfile.read(size))
+            self.rfile.readline()
+        return body.getvalue()
+
+    def _environ(self, body):
+        path, _, query = self.path.partition('?')
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'iso-8859-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.server.server_name,
+            'SERVER_PORT': str(self.server.server_port),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'REMOTE_PORT': str(self.client_address[1]),
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': self.headers.get('Content-Length', ''),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                continue
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def handle_wsgi(self):
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            data = self._read_chunked_body()
+            body = _BodyReader(io.BytesIO(data), len(data))
+            environ = self._environ(body)
+            # The app gets the decoded body with a plain length
+            environ['CONTENT_LENGTH'] = str(len(data))
+            environ.pop('HTTP_TRANSFER_ENCODING', None)
+        else:
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self.send_error(400, "Invalid Content-Length")
+                return
+            body = _BodyReader(self.rfile, length)
+            environ = self._environ(body)
+
+        state = {'status': None, 'headers': None, 'sent': False, 'chunked': False}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state['sent']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = status
+            state['headers'] = headers
+            return write
+
+        def send_headers():
+            code, _, reason = state['status'].partition(' ')
+            code = int(code)
+            self.send_response(code, reason)
+            names = set()
+            for name, value in state['headers']:
+                names.add(name.lower())
+                if name.lower() == 'connection' and value.lower() == 'close':
+                    self.close_connection = True
+                self.send_header(name, value)
+            has_body = self.command != 'HEAD' and code not in NO_BODY_STATUSES and code >= 200
+            if has_body and 'content-length' not in names:
+                if self.request_version == 'HTTP/1.1':
+                    # Length unknown (a stream): send it piece by piece
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    state['chunked'] = True
+                else:
+                    self.close_connection = True
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            state['sent'] = True
+            state['has_body'] = has_body
+
+        def write(data):
+            if not data:
+                return
+            if not state['sent']:
+                send_headers()
+            if not state['has_body']:
+                return
+            if state['chunked']:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            else:
+                self.wfile.write(data)
+            self.wfile.flush()
+
+        try:
+            result = app(environ, start_response)
+            try:
+                for data in result:
+                    write(data)
+                if not state['sent']:
+                    send_headers()
+                if state['chunked']:
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            body.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away mid-response
+            self.close_connection = True
+        except Exception as e:
+            print(f"ERROR handling {self.command} {self.path}: {e}", flush=True)
+            import traceback
+            traceback.print_exc()
+            if not state['sent']:
+                self.send_error(500)
+            # The response may be half written, so the connection can't be reused
+            self.close_connection = True
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_HEAD = handle_wsgi
+
     def log_message(self, format, *args):
-        """Suppress default logging"""
         print(f"[{self.client_address[0]}] {format % args}", flush=True)
 
-def run_server(port=5000):
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def run_server(port=5000, host='0.0.0.0'):
     """Run the HTTP server"""
     try:
-        server_address = ('0.0.0.0', port)
+        server_address = (host, port)
         print(f"Creating server on {server_address}...", flush=True)
-        httpd = HTTPServer(server_address, SimpleHandler)
+        httpd = Server(server_address, WSGIRequestHandler)
         print(f"✓ Server running on http://127.0.0.1:{port}", flush=True)
-        print(f"✓ Network: http://192.168.0.191:{port}", flush=True)
         print("Press CTRL+C to quit", flush=True)
-        
+
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down...", flush=True)
@@ -94,4 +229,4 @@ def run_server(port=5000):
 if __name__ == '__main__':
     print("Starting sentiment analysis backend...")
     print("Using Flask with Python's http.server")
-    run_server(5000)
+    run_server(int(os.getenv("PORT", "5000")))
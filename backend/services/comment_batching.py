@@ -0,0 +1,133 @@
+# Backend Service: Comment Batching
+# This module packs comments into as few LLM requests as possible, sized by
+# real token counts against the model's context window
+
+import bisect
+import os
+
+from services.tokenizer import context_window, count_message_tokens, count_tokens, get_model, split_by_tokens
+
+COMMENT_SUMMARY_PROMPT = (
+    "Summarize the following comments while keeping the detailed context. "
+    "A comment starting with \"[N similar comments]\" stands for N near-identical comments."
+)
+
+# Tokens left free in each request for the model's reply
+COMPLETION_RESERVE = 1024
+
+def comment_batch_budget(model=None, prompt=COMMENT_SUMMARY_PROMPT):
+    """Tokens of comment text one summarisation request can carry.
+
+    This is the model's context window minus the prompt and the space kept
+    for the reply, optionally capped by COMMENT_BATCH_MAX_TOKENS (smaller
+    batches mean more requests, but more of them can run in parallel).
+    """
+    model = model or get_model()
+    overhead = count_message_tokens([
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": ""}
+    ], model)
+    budget = context_window(model) - overhead - COMPLETION_RESERVE
+    cap = int(os.getenv("COMMENT_BATCH_MAX_TOKENS", "0"))
+    if cap:
+        budget = min(budget, cap)
+    return max(1, budget)
+
+def batch_comments(comments, max_tokens=None, model=None):
+    """Split comments into as few batches as possible within a token budget.
+
+    Comments longer than the budget are split into pieces. Pieces are then
+    bin-packed (best fit, largest first) so batches come out nearly full,
+    and the comments inside each batch keep their original order.
+    """
+    model = model or get_model()
+    budget = max_tokens or comment_batch_budget(model)
+
+    pieces = []
+    for comment in comments:
+        # +1 for the space comments are joined with
+        size = count_tokens(comment, model) + 1
+        if size <= budget:
+            pieces.append((size, len(pieces), comment))
+            continue
+        for part in split_by_tokens(comment, budget - 1, model):
+            pieces.append((count_tokens(part, model) + 1, len(pieces), part))
+
+    # Best-fit decreasing: free space of open batches kept sorted for bisect
+    batches = []
+    free = []
+    for size, order, text in sorted(pieces, key=lambda piece: -piece[0]):
+        i = bisect.bisect_left(free, (size, -1))
+        if i < len(free):
+            space, index = free.pop(i)
+        else:
+            space, index = budget, len(batches)
+            batches.append([])
+        batches[index].append((order, text))
+        bisect.insort(free, (space - size, index))
+
+    return [[text for _, text in sorted(batch)] for batch in batches]
+
+# Batches a StreamingBatcher keeps open at once
+DEFAULT_STREAM_WINDOW = 4
+
+class StreamingBatcher:
+    """Packs comments into batches as they arrive, for summarising while
+    later comments are still being fetched.
+
+    Up to `window` batches (default COMMENT_BATCH_WINDOW) stay open and each
+    comment goes to the fullest one it fits in (best fit, as in
+    batch_comments but without sorting, as later comments aren't known
+    yet). When a comment fits none and the window is full, the fullest open
+    batch is handed out. A larger window packs batches closer to full at
+    the cost of sending the first one later; a window of 1 fills batches
+    strictly in arrival order.
+
+    Each comment is added with a `key` that comes back alongside its text
+    (or each piece of it, if it had to be split). `reserve` tokens per
+    comment are kept free for text the caller adds when the batch is sent.
+    Comments inside a batch stay in arrival order.
+    """
+
+    def __init__(self, max_tokens=None, model=None, reserve=0, window=None):
+        self.model = model or get_model()
+        self.budget = max_tokens or comment_batch_budget(self.model)
+        self.reserve = reserve
+        self.window = max(1, window or int(os.getenv("COMMENT_BATCH_WINDOW", str(DEFAULT_STREAM_WINDOW))))
+        # Open batches as [tokens used, [(text, key), ...]]
+        self._open = []
+
+    def add(self, comment, key=None):
+        """Add a comment; returns the batches it filled (usually none)."""
+        full = []
+        # +1 for the space comments are joined with
+        size = count_tokens(comment, self.model) + 1 + self.reserve
+        if size <= self.budget:
+            pieces = [(comment, size)]
+        else:
+            pieces = [(part, count_tokens(part, self.model) + 1 + self.reserve)
+                      for part in split_by_tokens(comment, max(1, self.budget - 1 - self.reserve), self.model)]
+        for text, size in pieces:
+            fits = [batch for batch in self._open if batch[0] + size <= self.budget]
+            if fits:
+                batch = max(fits, key=lambda batch: batch[0])
+            else:
+                if len(self._open) >= self.window:
+                    fullest = max(self._open, key=lambda batch: batch[0])
+                    self._open.remove(fullest)
+                    full.append(fullest[1])
+                batch = [0, []]
+                self._open.append(batch)
+            batch[0] += size
+            batch[1].append((text, key))
+            if batch[0] >= self.budget:
+                # Nothing more fits
+                self._open.remove(batch)
+                full.append(batch[1])
+        return full
+
+    def flush(self):
+        """The open, partly filled batches (fullest first)."""
+        batches = [batch for _, batch in sorted(self._open, key=lambda batch: -batch[0])]
+        self._open = []
+        return batches
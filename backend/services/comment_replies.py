@@ -0,0 +1,152 @@
+# Backend Service: Comment Replies
+# This module adds replies to comment threads as their pages stream in:
+# replies YouTube already embeds in commentThreads.list responses are used
+# as they are, and only threads with more replies than that get their own
+# comments.list call, made on a bounded pool within a call budget and the
+# request's deadline
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from services.pipeline import submit_in_context
+from services.retry import is_quota_error, remaining_time
+from services.tokenizer import count_tokens
+
+DEFAULT_MAX_CALLS = 20
+DEFAULT_CONCURRENCY = 4
+
+# Replies analysed at most, on top of the sampled comments
+DEFAULT_MAX_REPLIES = 200
+
+# Replies one comments.list call returns at most
+MAX_REPLIES_PER_CALL = 100
+
+# Seconds of the request deadline left for summarising; no reply calls are
+# started (or waited for) past that point
+DEADLINE_RESERVE = 60
+
+class ReplyFetcher:
+    """Expands pages of top-level comments with their replies.
+
+    Each comment record may carry `replies` (the embedded ones) and
+    `replyCount` (the thread's total). `fetch_replies(thread_id, limit)`
+    returns a thread's reply records; it is called for at most `max_calls`
+    threads, `max_workers` at a time, and for none once the quota is used up
+    or the deadline is near. Replies that can't be fetched are skipped.
+
+    Replies have their own budget, like the sampled comments: at most
+    `max_replies` replies and `max_tokens` tokens of reply text (0 for no
+    limit) are passed on, in the order they arrive.
+    """
+
+    def __init__(self, fetch_replies, max_workers=DEFAULT_CONCURRENCY, max_calls=DEFAULT_MAX_CALLS,
+                 max_per_thread=MAX_REPLIES_PER_CALL, max_replies=DEFAULT_MAX_REPLIES, max_tokens=0):
+        self.fetch_replies = fetch_replies
+        self.max_workers = max(1, max_workers)
+        self.max_calls = max_calls
+        self.max_per_thread = min(max_per_thread, MAX_REPLIES_PER_CALL)
+        self.max_replies = max_replies
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.replies = 0
+        self.tokens = 0
+        self._stopped = False
+
+    def _within_budget(self, replies):
+        """The leading replies that still fit the budget, counting them as used."""
+        kept = []
+        for reply in replies:
+            if self.replies >= self.max_replies:
+                self._stopped = True
+                break
+            if self.max_tokens:
+                size = count_tokens(reply['text']) + 1
+                if self.tokens + size > self.max_tokens:
+                    self._stopped = True
+                    break
+                self.tokens += size
+            kept.append(reply)
+            self.replies += 1
+        return kept
+
+    def stats(self):
+        return {'repliesUsed': self.replies, 'replyCalls': self.calls}
+
+    def _time_left(self):
+        left = remaining_time()
+        return None if left is None else left - DEADLINE_RESERVE
+
+    def _fetch(self, thread_id):
+        try:
+            return self.fetch_replies(thread_id, self.max_per_thread)
+        except Exception as e:
+            print(f"Error fetching replies to {thread_id}: {e}")
+            if is_quota_error(e):
+                self._stopped = True
+            return []
+
+    def expand(self, pages):
+        """Yield each page with its embedded replies, then fetched replies as they arrive."""
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="replies")
+        pending = set()
+        try:
+            for page in pages:
+                expanded = []
+                for comment in page:
+                    embedded = comment.get('replies') or []
+                    expanded.append({k: v for k, v in comment.items() if k not in ('replies', 'replyCount')})
+                    total = comment.get('replyCount') or 0
+                    if total > len(embedded) and self._can_call():
+                        self.calls += 1
+                        pending.add(submit_in_context(executor, self._fetch, comment['id']))
+                    else:
+                        expanded.extend(self._within_budget(embedded[:self.max_per_thread]))
+                yield expanded
+
+                # Pass on replies fetched meanwhile without waiting for the rest
+                done = {future for future in pending if future.done()}
+                pending -= done
+                yield from self._collect(done)
+
+            while pending:
+                timeout = self._time_left()
+                if timeout is not None and timeout <= 0:
+                    break
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                yield from self._collect(done)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _can_call(self):
+        if self._stopped or self.calls >= self.max_calls:
+            return False
+        left = self._time_left()
+        return left is None or left > 0
+
+    def _collect(self, futures):
+        for future in futures:
+            replies = self._within_budget(future.result() if not future.cancelled() else [])
+            if replies:
+                yield replies
+
+def replies_enabled(requested=None):
+    """Whether to fetch replies: the request's choice, else COMMENT_REPLIES."""
+    if requested is not None:
+        return bool(requested)
+    return os.getenv("COMMENT_REPLIES", "false").lower() in ('1', 'true', 'yes')
+
+def max_reply_calls():
+    return int(os.getenv("COMMENT_REPLY_MAX_CALLS", str(DEFAULT_MAX_CALLS)))
+
+def get_reply_fetcher(fetch_replies):
+    """A ReplyFetcher configured from the COMMENT_REPLY_* settings."""
+    return ReplyFetcher(
+        fetch_replies,
+        max_workers=int(os.getenv("COMMENT_REPLY_CONCURRENCY", str(DEFAULT_CONCURRENCY))),
+        max_calls=max_reply_calls(),
+        max_per_thread=int(os.getenv("COMMENT_REPLY_MAX_PER_THREAD", str(MAX_REPLIES_PER_CALL))),
+        max_replies=int(os.getenv("COMMENT_REPLY_MAX_REPLIES", str(DEFAULT_MAX_REPLIES))),
+        max_tokens=int(os.getenv("COMMENT_REPLY_MAX_TOKENS", "0"))
+    )
@@ -0,0 +1,216 @@
+# Backend Service: Comment Sampling
+# This module decides which of a video's comments an analysis reads, within
+# fixed budgets of API pages, comments and tokens, so a video with 200k
+# comments costs about as much as one with 2k while the sample still
+# represents more than whatever was posted last
+
+import math
+import os
+import random
+
+from services.tokenizer import count_tokens
+
+# recent: the newest comments (order=time)
+# relevance: YouTube's top comments (order=relevance)
+# reservoir: a uniform random sample of every comment read
+# stratified_likes / stratified_date: a random sample spread proportionally
+#   across like-count bands or posting periods
+STRATEGIES = ('recent', 'relevance', 'reservoir', 'stratified_likes', 'stratified_date')
+
+DEFAULT_STRATEGY = 'recent'
+DEFAULT_MAX_PAGES = 20
+DEFAULT_MAX_COMMENTS = 500
+
+# comments per commentThreads.list page
+PAGE_SIZE = 100
+
+# Bands (by like count) or periods (by publish date) for stratified sampling
+STRATA = 8
+
+class CommentSampler:
+    """Pick the comments one analysis reads.
+
+    `max_pages` bounds the commentThreads.list requests (and so quota and
+    fetch time), `max_comments` the comments kept and `max_tokens` (0 for
+    no limit) the tokens of comment text kept. `recent` and `relevance`
+    pass pages through as they arrive and stop at the first budget reached;
+    the random strategies read up to `max_pages` pages first and then hand
+    out their sample. Sampling is seeded, so the same comments give the
+    same sample.
+    """
+
+    def __init__(self, strategy=DEFAULT_STRATEGY, max_pages=DEFAULT_MAX_PAGES,
+                 max_comments=DEFAULT_MAX_COMMENTS, max_tokens=0, seed=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown comment sampling strategy: {strategy}")
+        if max_comments < 1:
+            raise ValueError(f"max_comments must be at least 1, got {max_comments}")
+        self.strategy = strategy
+        self.max_pages = max(1, max_pages)
+        self.max_comments = max_comments
+        self.max_tokens = max_tokens
+        self.seed = seed
+        self.pages_read = 0
+        self.comments_read = 0
+        self.comments_kept = 0
+        # Comments offered to the reservoir so far
+        self._position = 0
+
+    @property
+    def order(self):
+        """The commentThreads.list order the strategy reads in."""
+        return 'relevance' if self.strategy == 'relevance' else 'time'
+
+    @property
+    def streaming(self):
+        return self.strategy in ('recent', 'relevance')
+
+    def page_budget(self):
+        """Most commentThreads.list requests a sample can take."""
+        if self.streaming:
+            return min(self.max_pages, math.ceil(self.max_comments / PAGE_SIZE))
+        return self.max_pages
+
+    def stats(self):
+        return {
+            'strategy': self.strategy,
+            'pagesRead': self.pages_read,
+            'commentsRead': self.comments_read,
+            'commentsUsed': self.comments_kept,
+        }
+
+    def sample(self, pages):
+        """Yield the sampled comments, in pages, from an iterator of comment pages."""
+        if self.streaming:
+            yield from self._take_first(pages)
+            return
+        comments = []
+        rnd = random.Random(self.seed)
+        for page in self._read(pages, self.max_pages):
+            if self.strategy == 'reservoir':
+                self._reservoir_add(comments, page, rnd)
+            else:
+                comments.extend(page)
+        if self.strategy == 'stratified_likes':
+            comments = self._stratified(comments, lambda c: c.get('likeCount') or 0, rnd, log_scale=True)
+        elif self.strategy == 'stratified_date':
+            comments = self._stratified(comments, lambda c: c.get('publishedAt') or '', rnd)
+        else:
+            comments = sorted(comments, key=lambda c: c['_order'])
+        comments = self._trim_to_tokens(comments, rnd)
+        self.comments_kept = len(comments)
+        for start in range(0, len(comments), PAGE_SIZE):
+            yield [{k: v for k, v in c.items() if k != '_order'} for c in comments[start:start + PAGE_SIZE]]
+
+    def _read(self, pages, max_pages):
+        # Closing the iterator early stops the fetching
+        for page in pages:
+            self.pages_read += 1
+            self.comments_read += len(page)
+            yield page
+            if self.pages_read >= max_pages:
+                break
+
+    def _take_first(self, pages):
+        tokens = 0
+        for page in self._read(pages, self.page_budget()):
+            kept = []
+            for comment in page:
+                if self.max_tokens:
+                    tokens += count_tokens(comment['text']) + 1
+                    if tokens > self.max_tokens:
+                        break
+                kept.append(comment)
+                if self.comments_kept + len(kept) >= self.max_comments:
+                    break
+            self.comments_kept += len(kept)
+            if kept:
+                yield kept
+            if len(kept) < len(page) or self.comments_kept >= self.max_comments:
+                return
+
+    def _reservoir_add(self, reservoir, page, rnd):
+        """Algorithm R: every comment read so far is equally likely to be kept."""
+        for comment in page:
+            index = self._position
+            self._position += 1
+            comment = dict(comment, _order=index)
+            if len(reservoir) < self.max_comments:
+                reservoir.append(comment)
+            else:
+                slot = rnd.randrange(index + 1)
+                if slot < self.max_comments:
+                    reservoir[slot] = comment
+
+    def _stratified(self, comments, key, rnd, log_scale=False):
+        """Sample proportionally from STRATA bands of `key`.
+
+        Every non-empty band gets at least one comment, or with fewer
+        comments to keep than bands, the largest bands get one each.
+        """
+        comments = [dict(c, _order=i) for i, c in enumerate(comments)]
+        if len(comments) <= self.max_comments:
+            return comments
+        if log_scale:
+            values = [int(math.log2(key(c) + 1)) for c in comments]
+            top = max(values)
+            bands = [min(STRATA - 1, value * STRATA // (top + 1)) for value in values]
+        else:
+            # Equal-sized periods by rank, as dates are strings
+            ranked = sorted(range(len(comments)), key=lambda i: key(comments[i]))
+            bands = [0] * len(comments)
+            for rank, i in enumerate(ranked):
+                bands[i] = rank * STRATA // len(comments)
+        strata = {}
+        for comment, band in zip(comments, bands):
+            strata.setdefault(band, []).append(comment)
+
+        # Largest remainder allocation, then at least one per guaranteed band,
+        # taken from bands that keep at least one (or aren't guaranteed one)
+        total = len(comments)
+        shares = {band: self.max_comments * len(members) / total for band, members in strata.items()}
+        allocation = {band: int(share) for band, share in shares.items()}
+        leftover = self.max_comments - sum(allocation.values())
+        for band in sorted(shares, key=lambda b: shares[b] - allocation[b], reverse=True)[:leftover]:
+            allocation[band] += 1
+        guaranteed = set(sorted(strata, key=lambda b: len(strata[b]), reverse=True)[:self.max_comments])
+        for band in guaranteed:
+            if allocation[band] == 0:
+                donors = [b for b in allocation if allocation[b] > 1 or (allocation[b] == 1 and b not in guaranteed)]
+                allocation[max(donors, key=allocation.get)] -= 1
+                allocation[band] = 1
+
+        sample = []
+        for band, members in strata.items():
+            sample.extend(rnd.sample(members, min(len(members), allocation[band])))
+        return sorted(sample, key=lambda c: c['_order'])
+
+    def _trim_to_tokens(self, comments, rnd):
+        """Drop randomly chosen comments until the rest fit the token budget."""
+        if not self.max_tokens:
+            return comments
+        order = list(range(len(comments)))
+        rnd.shuffle(order)
+        keep = set()
+        tokens = 0
+        for i in order:
+            size = count_tokens(comments[i]['text']) + 1
+            if tokens + size > self.max_tokens:
+                continue
+            tokens += size
+            keep.add(i)
+        return [comment for i, comment in enumerate(comments) if i in keep]
+
+def sampling_strategy(strategy=None):
+    """The strategy to use: `strategy` if given, else COMMENT_SAMPLING."""
+    return strategy or os.getenv("COMMENT_SAMPLING", DEFAULT_STRATEGY)
+
+def get_sampler(strategy=None, seed=None):
+    """A sampler configured from COMMENT_SAMPLING and the COMMENT_SAMPLE_MAX_* budgets."""
+    return CommentSampler(
+        sampling_strategy(strategy),
+        max_pages=int(os.getenv("COMMENT_SAMPLE_MAX_PAGES", str(DEFAULT_MAX_PAGES))),
+        max_comments=int(os.getenv("COMMENT_SAMPLE_MAX_COMMENTS", str(DEFAULT_MAX_COMMENTS))),
+        max_tokens=int(os.getenv("COMMENT_SAMPLE_MAX_TOKENS", "0")),
+        seed=seed
+    )
@@ -0,0 +1,160 @@
+# Backend Service: Comment Streaming
+# This module ingests a video's comments page by page while they are still
+# being fetched: each page is de-duplicated and scored straight away and
+# comment batches go off for summarisation as soon as they fill up, so
+# paging through YouTube overlaps with the LLM work instead of preceding it
+
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.comment_batching import StreamingBatcher
+from services.dedup import DuplicateGrouper
+from services.lexicon_sentiment import get_lexicon_engine
+
+# Tokens kept free per comment for the "[N similar comments] " marker
+COUNT_MARKER_TOKENS = 8
+
+# Fetched pages waiting to be ingested; the fetcher pauses when it is full
+DEFAULT_PAGE_QUEUE_SIZE = 4
+
+_END = object()
+
+class CommentIngest:
+    """Comments of one video, ingested as they arrive.
+
+    Feed pages of {'id', 'text', 'publishedAt'} records with consume()
+    (or add_page()), then call finish(). Afterwards `records` holds every
+    comment, `groups` the [text, count] duplicate groups and
+    `sentiment_counts` the weighted counts, while the summaries of the
+    batches may still be in flight until summaries() is called.
+
+    `summarize(texts)` is called on a pool of `max_workers` threads for
+    each full batch. At most `max_pending` batches are queued or running;
+    once that many are, ingesting (and so fetching) waits for one to finish.
+    Comments are sent with the duplicate count their group had when the
+    batch filled, while the sentiment counts cover every duplicate.
+    """
+
+    def __init__(self, summarize=None, max_workers=4, max_pending=None, max_tokens=None, threshold=None):
+        self.records = []
+        self.sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+        # Set when fetching failed part-way, so the comments are incomplete
+        self.error = None
+        self._grouper = DuplicateGrouper(threshold)
+        self._labels = []
+        self._summarize = summarize
+        self._futures = []
+        self._batcher = None
+        self._executor = None
+        if summarize is not None:
+            self._batcher = StreamingBatcher(max_tokens, reserve=COUNT_MARKER_TOKENS)
+            self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="comment-batch")
+            self._slots = threading.BoundedSemaphore(max_pending or 2 * max(1, max_workers))
+
+    @property
+    def groups(self):
+        return self._grouper.groups
+
+    @property
+    def complete(self):
+        return self.error is None
+
+    def add_page(self, page):
+        """De-duplicate and score one page of comments, sending any batches it fills."""
+        new_groups = []
+        for record in page:
+            self.records.append(record)
+            index, is_new = self._grouper.add(record['text'])
+            if is_new:
+                new_groups.append(index)
+                self._labels.append(None)
+            else:
+                # Duplicates of a scored group count towards its label
+                label = self._labels[index]
+                if label is not None:
+                    self.sentiment_counts[label] += 1
+
+        groups = self._grouper.groups
+        # Score the page's new groups in one pass, plus the duplicates of
+        # them that arrived on the same page
+        labels = get_lexicon_engine().classify([groups[index][0] for index in new_groups])
+        for index, label in zip(new_groups, labels):
+            self._labels[index] = label
+            self.sentiment_counts[label] += groups[index][1]
+
+        if self._batcher is not None:
+            for index in new_groups:
+                for batch in self._batcher.add(groups[index][0], index):
+                    self._submit(batch)
+
+    def consume(self, pages, queue_size=None):
+        """Ingest pages from an iterator running on its own thread.
+
+        The fetching thread gets at most `queue_size` pages ahead. If the
+        iterator raises, the pages before it are kept and the error is
+        stored in `error`.
+        """
+        queue_size = queue_size or int(os.getenv("COMMENT_PAGE_QUEUE_SIZE", str(DEFAULT_PAGE_QUEUE_SIZE)))
+        pages_queue = queue.Queue(maxsize=max(1, queue_size))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+            except BaseException as e:
+                put((_END, e))
+                return
+            put((_END, None))
+
+        # The fetching thread sees this thread's deadline, quota reservation and timings
+        ctx = contextvars.copy_context()
+        fetcher = threading.Thread(target=ctx.run, args=(fetch,), name="comment-pages", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                item = pages_queue.get()
+                if isinstance(item, tuple) and len(item) == 2 and item[0] is _END:
+                    if item[1] is not None:
+                        self.error = item[1]
+                    return self
+                self.add_page(item)
+        finally:
+            stop.set()
+
+    def finish(self):
+        """Send the last partial batches; nothing more can be added afterwards."""
+        if self._batcher is not None:
+            for batch in self._batcher.flush():
+                self._submit(batch)
+            self._executor.shutdown(wait=False)
+        return self
+
+    def summaries(self):
+        """Wait for every batch summary and return them in batch order."""
+        return [future.result() for future in self._futures]
+
+    def _submit(self, batch):
+        groups = self._grouper.groups
+        texts = []
+        for text, index in batch:
+            count = groups[index][1]
+            texts.append(text if count == 1 else f"[{count} similar comments] {text}")
+        self._slots.acquire()
+        ctx = contextvars.copy_context()
+        future = self._executor.submit(ctx.run, self._summarize, texts)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
@@ -0,0 +1,158 @@
+# Backend Service: Completion Cache
+# This module caches OpenAI chat completions on disk, keyed by a hash of
+# the model, messages and parameters, so identical requests cost nothing
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from services.metrics import CACHE_LOOKUPS
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'completions.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+# Set for the duration of a request that must not be answered from cache
+_bypass = contextvars.ContextVar("completion_cache_bypass", default=False)
+
+@contextlib.contextmanager
+def bypass_cache(enabled=True):
+    """Skip cache lookups for the enclosed work (fresh results are still stored)."""
+    token = _bypass.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def cache_bypassed():
+    return _bypass.get()
+
+def completion_key(model, messages, params):
+    """Content hash identifying a completion request."""
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class CompletionCache:
+    """SQLite-backed completion cache with TTL and least-recently-used eviction.
+
+    Entries older than `ttl` seconds are ignored and removed, and the least
+    recently used entries are evicted once the stored text exceeds
+    `max_bytes`. Hit and miss counts are kept per process.
+    """
+
+    def __init__(self, path, ttl=7 * 86400, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        CACHE_LOOKUPS.inc(result='hit' if hit else 'miss')
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the cached completion text for a key, or None."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            self._count(False)
+            return None
+        with conn:
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, content, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, content, len(content.encode('utf-8')), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        if not self.max_bytes:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until back under the cap
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM completions WHERE key = ?", stale)
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': hits / lookups if lookups else 0.0
+        }
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+def get_completion_cache():
+    """Lazily create the shared cache, or return None if COMPLETION_CACHE_ENABLED is off."""
+    global _completion_cache
+    if os.getenv("COMPLETION_CACHE_ENABLED", "true").lower() in ('0', 'false', 'no'):
+        return None
+    if _completion_cache is None:
+        with _completion_cache_lock:
+            if _completion_cache is None:
+                _completion_cache = CompletionCache(
+                    os.getenv("COMPLETION_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    ttl=int(os.getenv("COMPLETION_CACHE_TTL", str(7 * 86400))),
+                    max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+                )
+    return _completion_cache
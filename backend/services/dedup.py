@@ -0,0 +1,168 @@
+# Backend Service: Comment De-duplication
+# This module collapses exact and near-duplicate comments ("first!",
+# copy-paste spam) into one representative with a count, using MinHash
+# signatures and locality-sensitive hashing over normalised shingles
+
+import functools
+import hashlib
+import os
+import re
+import unicodedata
+
+# Character shingle length (short enough that one-word edits to short
+# comments still leave most shingles shared)
+SHINGLE_SIZE = 3
+
+# MinHash signature length, split into LSH bands of BAND_ROWS values each.
+# 16 bands of 4 make pairs above ~0.5 Jaccard likely candidates; candidates
+# are then checked against the real threshold.
+NUM_PERM = 64
+BAND_ROWS = 4
+
+# Most group representatives a comment is compared with
+MAX_CANDIDATES = 32
+
+DEFAULT_THRESHOLD = 0.7
+
+# Key for the shingle hash; changing it changes every signature
+HASH_SEED = b"yt-comment-dedup"
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+def normalize(text):
+    """Lowercase, fold Unicode forms and drop punctuation and extra spaces."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+def shingles(text):
+    """Character shingles of a normalised comment."""
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+@functools.lru_cache(maxsize=1 << 16)
+def _shingle_hash(shingle):
+    # Not Python's hash(), which is salted per process: signatures must agree
+    # between gunicorn workers and across restarts. Cached as the same short
+    # shingles come up again and again.
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8, key=HASH_SEED).digest()
+    return int.from_bytes(digest, "little") & 0xFFFFFFFFFFFF
+
+def minhash(shingle_set):
+    """MinHash signature of a set of shingles.
+
+    Uses one-permutation hashing: each shingle's hash goes to one of NUM_PERM
+    bins by its low bits and each bin keeps its minimum, so a signature
+    costs one pass over the shingles rather than one per bin. Empty bins
+    borrow the value of the next non-empty bin.
+    """
+    bins = [None] * NUM_PERM
+    for shingle in shingle_set:
+        value = _shingle_hash(shingle)
+        index = value % NUM_PERM
+        value //= NUM_PERM
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    if None not in bins:
+        return bins
+    signature = list(bins)
+    for index in range(NUM_PERM):
+        if bins[index] is None:
+            step = 1
+            while bins[(index + step) % NUM_PERM] is None:
+                step += 1
+            # Tagged with the distance so borrowed values differ from the original
+            signature[index] = (bins[(index + step) % NUM_PERM], step)
+    return signature
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def get_threshold():
+    """Similarity above which comments are merged, from COMMENT_DEDUP_THRESHOLD (0 disables)."""
+    return float(os.getenv("COMMENT_DEDUP_THRESHOLD", str(DEFAULT_THRESHOLD)))
+
+class DuplicateGrouper:
+    """Groups near-duplicate comments as they are added one at a time.
+
+    `groups` holds [text, count] pairs in order of first appearance, where
+    `text` is the first comment of its group and `count` how many comments
+    it stands for. Comments that are identical after normalising always
+    join the same group; others join a group when the Jaccard similarity
+    of their shingles with its representative is at least `threshold`.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = get_threshold() if threshold is None else threshold
+        self.groups = []
+        self._exact = {}
+        # Only group representatives are indexed, so groups never drift
+        # through chains of slightly different comments
+        self._buckets = {}
+        self._rep_shingles = []
+
+    def add(self, comment):
+        """Add a comment; returns its group's index and whether it started that group."""
+        groups = self.groups
+        if not self.threshold:
+            groups.append([comment, 1])
+            return len(groups) - 1, True
+
+        # Comments made only of emoji or punctuation normalise to nothing
+        key = normalize(comment) or comment.strip()
+        index = self._exact.get(key)
+        if index is not None:
+            groups[index][1] += 1
+            return index, False
+
+        shingle_set = shingles(key)
+        signature = minhash(shingle_set)
+        bands = [
+            (band, tuple(signature[band:band + BAND_ROWS]))
+            for band in range(0, NUM_PERM, BAND_ROWS)
+        ]
+
+        buckets = self._buckets
+        rep_shingles = self._rep_shingles
+        threshold = self.threshold
+        match = None
+        checked = set()
+        for band in bands:
+            for candidate in buckets.get(band, ()):
+                if candidate in checked:
+                    continue
+                if len(checked) >= MAX_CANDIDATES:
+                    break
+                checked.add(candidate)
+                if jaccard(shingle_set, rep_shingles[candidate]) >= threshold:
+                    match = candidate
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            groups[match][1] += 1
+            self._exact[key] = match
+            return match, False
+
+        index = len(groups)
+        groups.append([comment, 1])
+        rep_shingles.append(shingle_set)
+        self._exact[key] = index
+        for band in bands:
+            buckets.setdefault(band, []).append(index)
+        return index, True
+
+def collapse_duplicates(comments, threshold=None):
+    """Group near-duplicate comments (see DuplicateGrouper).
+
+    Returns a list of (text, count) pairs in order of first appearance.
+    """
+    grouper = DuplicateGrouper(threshold)
+    for comment in comments:
+        grouper.add(comment)
+    return [(text, count) for text, count in grouper.groups]
+
+def with_counts(groups):
+    """Comment texts for summarisation, each marked with how many comments it stands for."""
+    return [text if count == 1 else f"[{count} similar comments] {text}" for text, count in groups]
@@ -0,0 +1,284 @@
+# Backend Service: Analysis Jobs
+# This module runs analyses as background jobs on a bounded worker pool and
+# merges concurrent jobs for the same video so the work happens only once.
+# Job records live in a SQLite file shared by every worker process, so any
+# worker can report a job's status and join a job another worker started.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.pipeline import submit_in_context
+
+DEFAULT_JOB_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'jobs.db')
+
+# Seconds between the heartbeats a process writes for its active jobs, and
+# after how long without one a job counts as lost (its process died)
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 60
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        job_key TEXT NOT NULL,
+        video_id TEXT NOT NULL,
+        options TEXT NOT NULL,
+        status TEXT NOT NULL,
+        completed_stages TEXT NOT NULL,
+        total_stages INTEGER,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        finished_at REAL,
+        heartbeat REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_active ON jobs (job_key, status)",
+]
+
+_COLUMNS = ("id, video_id, options, status, completed_stages, total_stages, result, error, "
+            "created_at, finished_at, heartbeat")
+
+def _job_key(video_id, options):
+    return json.dumps([video_id, options or {}], sort_keys=True, separators=(',', ':'))
+
+class Job:
+    """State of one background analysis, shared by every caller that asked for it."""
+
+    def __init__(self, video_id, options=None):
+        self.id = uuid.uuid4().hex
+        self.video_id = video_id
+        # How the video is analysed (passed on to the runner)
+        self.options = dict(options or {})
+        self.status = 'queued'
+        self.completed_stages = []
+        self.total_stages = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Called with the job whenever its progress changes
+        self._on_change = None
+
+    @classmethod
+    def from_row(cls, row):
+        """A snapshot of a job from its stored record."""
+        (job_id, video_id, options, status, completed_stages, total_stages, result, error,
+         created_at, finished_at, heartbeat) = row
+        job = cls(video_id, json.loads(options))
+        job.id = job_id
+        job.status = status
+        job.completed_stages = json.loads(completed_stages)
+        job.total_stages = total_stages
+        job.result = json.loads(result) if result is not None else None
+        job.error = error
+        job.created_at = created_at
+        job.finished_at = finished_at
+        if job.active and time.time() - heartbeat > STALE_AFTER:
+            # The process running it went away before it finished
+            job.status = 'failed'
+            job.error = job.error or 'Job was interrupted'
+        return job
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def stage_done(self, name, total_stages):
+        """Record that a pipeline stage finished."""
+        self.total_stages = total_stages
+        self.completed_stages.append(name)
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def to_dict(self):
+        progress = 0.0
+        if self.status == 'done':
+            progress = 1.0
+        elif self.total_stages:
+            progress = len(self.completed_stages) / self.total_stages
+        data = {
+            'jobId': self.id,
+            'videoId': self.video_id,
+            'options': dict(self.options),
+            'status': self.status,
+            'progress': round(progress, 3),
+            'completedStages': list(self.completed_stages),
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at
+        }
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+class JobStore:
+    """SQLite store of job records, shared by every process using the same file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Transactions are opened explicitly (see create_or_join())
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create_or_join(self, job):
+        """Store `job`, unless an active job with the same video and options exists.
+
+        Returns the existing job (a snapshot) or None if `job` was stored.
+        """
+        key = _job_key(job.video_id, job.options)
+        now = time.time()
+        conn = self._connect()
+        # Take the write lock first so two processes can't both create a job
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE job_key = ? AND status IN ('queued', 'running') "
+                "AND heartbeat >= ? ORDER BY created_at DESC LIMIT 1",
+                (key, now - STALE_AFTER)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, job_key, video_id, options, status, completed_stages, created_at, heartbeat) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.id, key, job.video_id, json.dumps(job.options), job.status, '[]', job.created_at, now)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Job.from_row(row) if row is not None else None
+
+    def save(self, job):
+        """Write a job's progress, result and status."""
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, completed_stages = ?, total_stages = ?, result = ?, error = ?, "
+            "finished_at = ?, heartbeat = ? WHERE id = ?",
+            (job.status, json.dumps(job.completed_stages), job.total_stages,
+             json.dumps(job.result) if job.result is not None else None, job.error,
+             job.finished_at, time.time(), job.id)
+        )
+
+    def heartbeat(self, job_ids):
+        """Mark jobs as still being worked on."""
+        if job_ids:
+            self._connect().executemany(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ?", [(time.time(), job_id) for job_id in job_ids]
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def prune(self, cutoff):
+        """Forget jobs that finished (or were last heard of) before `cutoff`."""
+        self._connect().execute(
+            "DELETE FROM jobs WHERE COALESCE(finished_at, heartbeat) < ?", (cutoff,)
+        )
+
+class JobManager:
+    """Runs `runner(job)` for submitted videos on a pool of `max_workers` threads.
+
+    The runner returns the result dict, or raises. While a job for a video
+    is queued or running, in this process or another one sharing `store`,
+    submitting the same video with the same options returns that job.
+    Finished jobs are kept for `retention` seconds so clients can poll them.
+    """
+
+    def __init__(self, runner, store, max_workers=4, retention=3600):
+        self.runner = runner
+        self.store = store
+        self.max_workers = max_workers
+        self.retention = retention
+        # Jobs running in this process, by ID
+        self._running = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._heartbeat_pid = None
+
+    def _get_executor(self):
+        # Created on first use so a pre-forking server doesn't share it
+        if self._executor is None or self._heartbeat_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis-job")
+            self._heartbeat_pid = os.getpid()
+            threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+        return self._executor
+
+    def _heartbeat_loop(self):
+        pid = os.getpid()
+        while self._heartbeat_pid == pid:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._lock:
+                job_ids = list(self._running)
+            try:
+                self.store.heartbeat(job_ids)
+                self.store.prune(time.time() - self.retention)
+            except sqlite3.Error as e:
+                print(f"Error updating job heartbeats: {e}")
+
+    def submit(self, video_id, options=None):
+        """Start (or join) the analysis of a video. Returns (job, created).
+
+        `options` is a dict of JSON values, stored on the job.
+        """
+        job = Job(video_id, options)
+        with self._lock:
+            existing = self.store.create_or_join(job)
+            if existing is not None:
+                return self._running.get(existing.id, existing), False
+            job._on_change = self._save
+            self._running[job.id] = job
+            submit_in_context(self._get_executor(), self._run, job)
+            return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._running.get(job_id)
+        return job if job is not None else self.store.get(job_id)
+
+    def _save(self, job):
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            print(f"Error saving job {job.id}: {e}")
+
+    def _run(self, job):
+        job.status = 'running'
+        self._save(job)
+        try:
+            job.result = self.runner(job)
+            job.status = 'done'
+        except Exception as e:
+            print(f"Error in analysis job {job.id}: {e}")
+            job.status = 'failed'
+            if job.error is None:
+                job.error = str(e) or type(e).__name__
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            with self._lock:
+                self._running.pop(job.id, None)
+
+def get_job_store():
+    """The job store at JOB_STORE_PATH."""
+    return JobStore(os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH))
@@ -0,0 +1,128 @@
+# Backend Service: Lexicon Sentiment Engine
+# This module scores comments against a weighted word lexicon. It is the
+# lightweight sentiment path used by app.py, with no model to load
+
+import json
+import os
+import re
+import threading
+
+# Weights for the words the original heuristic looked for, plus their
+# common inflections now that matching is on whole words
+DEFAULT_LEXICON = {
+    'good': 1.0, 'great': 1.0, 'excellent': 1.0, 'amazing': 1.0,
+    'love': 1.0, 'loved': 1.0, 'loves': 1.0, 'lovely': 1.0,
+    'thanks': 1.0, 'thank': 1.0, 'helpful': 1.0, 'wonderful': 1.0,
+    'bad': -1.0, 'terrible': -1.0, 'hate': -1.0, 'hated': -1.0, 'hates': -1.0,
+    'awful': -1.0, 'worst': -1.0, 'disappointing': -1.0, 'disappointed': -1.0,
+    'poor': -1.0, 'useless': -1.0,
+}
+
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'none', 'nothing', 'nobody', 'neither', 'nor',
+    'hardly', 'barely', 'without', 'cannot', 'dont', 'doesnt', 'didnt',
+    'isnt', 'wasnt', 'arent', 'werent', 'cant', 'wont', 'wouldnt', 'shouldnt',
+])
+
+# Separates comments in the joined text; never part of a word
+_COMMENT_SEPARATOR = '\x00'
+
+# Words (keeping apostrophes, so "don't" is one token), clause-ending
+# punctuation that closes a negation's scope, and the comment separator
+_TOKEN_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*|[.!?;]|\x00")
+
+def load_lexicon(path):
+    """Load a weighted lexicon from a JSON object or a tab-separated file.
+
+    Tab-separated files use the first column as the word and the second as
+    its weight, which also reads VADER-style lexicons. Multi-word entries
+    are skipped since matching is word by word.
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f).items()
+    else:
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) >= 2 and not line.startswith('#'):
+                    entries.append((parts[0], parts[1]))
+    lexicon = {}
+    for word, weight in entries:
+        word = word.strip().lower()
+        if word and ' ' not in word:
+            lexicon[word] = float(weight)
+    return lexicon
+
+class LexiconSentiment:
+    """Scores comments as the sum of their words' lexicon weights.
+
+    A negation word flips (and damps) the weight of sentiment words in the
+    next `negation_window` words, until the clause ends. The whole list of
+    comments is tokenised in one pass with a single compiled pattern, so
+    the cost is linear in the total text length.
+    """
+
+    def __init__(self, lexicon=None, negation_window=3, negation_factor=-0.75):
+        self.lexicon = dict(DEFAULT_LEXICON if lexicon is None else lexicon)
+        self.negation_window = negation_window
+        self.negation_factor = negation_factor
+
+    def score(self, comments):
+        """Return one sentiment score per comment (positive > 0 > negative)."""
+        scores = [0.0] * len(comments)
+        if not comments:
+            return scores
+        text = _COMMENT_SEPARATOR.join(c.replace(_COMMENT_SEPARATOR, ' ') for c in comments)
+        text = text.lower().replace('’', "'")
+
+        lexicon = self.lexicon
+        negations = NEGATIONS
+        window = self.negation_window
+        factor = self.negation_factor
+        index = 0
+        total = 0.0
+        negated_for = 0
+        for token in _TOKEN_RE.findall(text):
+            if token == _COMMENT_SEPARATOR:
+                scores[index] = total
+                index += 1
+                total = 0.0
+                negated_for = 0
+                continue
+            weight = lexicon.get(token)
+            if weight is not None:
+                total += weight * factor if negated_for else weight
+            if token in negations or token.endswith("n't"):
+                negated_for = window
+            elif negated_for:
+                negated_for = 0 if token in '.!?;' else negated_for - 1
+        scores[index] = total
+        return scores
+
+    def classify(self, comments):
+        """Return 'positive', 'negative' or 'neutral' for each comment."""
+        return [
+            'positive' if score > 0 else 'negative' if score < 0 else 'neutral'
+            for score in self.score(comments)
+        ]
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_lexicon_engine():
+    """Lazily build the shared engine, from SENTIMENT_LEXICON_PATH if it is set."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                path = os.getenv("SENTIMENT_LEXICON_PATH")
+                lexicon = None
+                if path:
+                    try:
+                        lexicon = load_lexicon(path)
+                    except Exception as e:
+                        print(f"Error loading sentiment lexicon {path}: {e}")
+                _engine = LexiconSentiment(lexicon)
+    return _engine
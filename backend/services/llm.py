@@ -0,0 +1,115 @@
+# Backend Service: LLM Calls
+# This module sends chat completion requests through the shared rate
+# limiter and retry policy, so every OpenAI call behaves the same way
+
+from concurrent.futures import CancelledError
+
+from services.completion_cache import cache_bypassed, completion_key, get_completion_cache
+from services.metrics import OPENAI_REQUEST_SECONDS, record_openai_usage, timed
+from services.rate_limiter import get_openai_limiter
+from services.retry import remaining_time, retry_call
+from services.tokenizer import count_message_tokens, count_tokens, get_model
+
+def _cached(model, messages, params):
+    # Returns (cache, key, cached_text); cache is None when caching is off
+    try:
+        cache = get_completion_cache()
+        if cache is None:
+            return None, None, None
+        key = completion_key(model, messages, params)
+        if cache_bypassed():
+            return cache, key, None
+        return cache, key, cache.get(key)
+    except Exception as e:
+        print(f"Error reading completion cache: {e}")
+        return None, None, None
+
+def _store(cache, key, content):
+    if cache is None or not content:
+        return
+    try:
+        cache.put(key, content)
+    except Exception as e:
+        print(f"Error writing completion cache: {e}")
+
+# Per-attempt timeout for OpenAI requests when no request deadline is tighter
+REQUEST_TIMEOUT = 120.0
+
+def chat_completion(client, messages, model=None, cancel_event=None, **params):
+    """Send a chat completion request and return the reply text.
+
+    Identical requests are answered from the completion cache. Otherwise
+    waits for the rate limiter, then retries transient failures with
+    backoff. Raises CancelledError if `cancel_event` is set while waiting,
+    and re-raises the API error once retrying is no longer worthwhile.
+    """
+    model = model or get_model()
+    cache, key, cached = _cached(model, messages, params)
+    if cached is not None:
+        return cached
+    tokens = count_message_tokens(messages, model)
+    if not get_openai_limiter().acquire(tokens, cancel_event=cancel_event):
+        raise CancelledError()
+
+    def create():
+        remaining = remaining_time()
+        timeout = REQUEST_TIMEOUT if remaining is None else max(1.0, min(REQUEST_TIMEOUT, remaining))
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            **params
+        )
+
+    with timed(OPENAI_REQUEST_SECONDS, 'openai', model=model, stream='false'):
+        response = retry_call(create, cancel_event=cancel_event)
+    content = response.choices[0].message.content
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        record_openai_usage(model, usage.prompt_tokens, usage.completion_tokens)
+    else:
+        record_openai_usage(model, tokens, count_tokens(content or "", model))
+    _store(cache, key, content)
+    return content
+
+def chat_completion_stream(client, messages, on_delta, model=None, cancel_event=None, **params):
+    """Stream a chat completion, calling `on_delta(text)` for each piece of the reply.
+
+    Opening the stream is retried like chat_completion(); once text has
+    started arriving a failure is raised to the caller. A cached reply is
+    delivered as a single piece. Returns the full reply text.
+    """
+    model = model or get_model()
+    cache, key, cached = _cached(model, messages, params)
+    if cached is not None:
+        on_delta(cached)
+        return cached
+    tokens = count_message_tokens(messages, model)
+    if not get_openai_limiter().acquire(tokens, cancel_event=cancel_event):
+        raise CancelledError()
+
+    def create():
+        remaining = remaining_time()
+        timeout = REQUEST_TIMEOUT if remaining is None else max(1.0, min(REQUEST_TIMEOUT, remaining))
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            stream=True,
+            **params
+        )
+
+    parts = []
+    with timed(OPENAI_REQUEST_SECONDS, 'openai', model=model, stream='true'):
+        for chunk in retry_call(create, cancel_event=cancel_event):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+    content = "".join(parts)
+    # Streamed responses carry no usage, so count what was sent and received
+    record_openai_usage(model, tokens, count_tokens(content, model) if content else 0)
+    _store(cache, key, content)
+    return content
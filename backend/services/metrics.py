@@ -0,0 +1,377 @@
+# Backend Service: Metrics
+# This module keeps process-wide counters and latency histograms (rendered
+# in the Prometheus text format for /metrics) and a per-request breakdown
+# of where the time went, sent back in the Server-Timing header. With
+# several worker processes, each writes its metrics to a shared directory
+# and /metrics adds them all up.
+
+import bisect
+import contextlib
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+# Default latency buckets in seconds, from cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Seconds between writes of a process's metrics to METRICS_MULTIPROC_DIR
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Metrics of exited worker processes, merged into one file
+ARCHIVE_FILE = 'metrics_archive.json'
+
+# USD per 1K prompt and completion tokens, longest model prefix wins
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-32k': (0.06, 0.12),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4-1106': (0.01, 0.03),
+    'gpt-4-0125': (0.01, 0.03),
+    'gpt-4o': (0.005, 0.015),
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._registry = None
+
+    def empty_copy(self):
+        return Counter(self.name, self.help, self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if self._registry is not None:
+            self._registry.changed()
+
+    def dump(self):
+        """Raw values, as JSON-compatible lists."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def load(self, dumped):
+        """Add values from another process's dump()."""
+        with self._lock:
+            for key, value in dumped:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Histogram:
+    """Observed values per label combination, counted into cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        self._registry = None
+
+    def empty_copy(self):
+        return Histogram(self.name, self.help, self.labelnames, self.buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        if self._registry is not None:
+            self._registry.changed()
+
+    def dump(self):
+        """Raw series, as JSON-compatible lists."""
+        with self._lock:
+            return [[list(key), list(counts), total, count] for key, (counts, total, count) in self._series.items()]
+
+    def load(self, dumped):
+        """Add series from another process's dump() (with the same buckets)."""
+        with self._lock:
+            for key, counts, total, count in dumped:
+                key = tuple(key)
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class Registry:
+    """The set of metrics exposed by /metrics.
+
+    When `multiproc_dir` is set, every process using it writes its values
+    there (as metrics_<pid>.json, at most `flush_interval` seconds behind)
+    and render() adds up the values of all of them, so any worker can
+    answer a scrape for the whole server.
+    """
+
+    def __init__(self, multiproc_dir=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self._metrics = []
+        self._lock = threading.Lock()
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._dirty = threading.Event()
+        self._writer_pid = None
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        metric._registry = self
+        return metric
+
+    def changed(self):
+        """Note that a value changed, starting this process's writer if needed."""
+        if not self.multiproc_dir:
+            return
+        self._dirty.set()
+        # Threads don't survive a fork, so each process starts its own
+        if self._writer_pid != os.getpid():
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    self._writer_pid = os.getpid()
+                    threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True).start()
+
+    def _write_loop(self):
+        pid = os.getpid()
+        while self._writer_pid == pid:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+
+    def write(self):
+        """Write this process's values to the multiprocess directory."""
+        if not self.multiproc_dir:
+            return
+        self._dirty.clear()
+        with self._lock:
+            metrics = list(self._metrics)
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        _write_json(os.path.join(self.multiproc_dir, f"metrics_{os.getpid()}.json"),
+                    {metric.name: metric.dump() for metric in metrics})
+
+    def mark_process_dead(self, pid):
+        """Fold an exited process's values into the archive so they still count."""
+        if not self.multiproc_dir:
+            return
+        path = os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+        dumped = _read_json(path)
+        archive_path = os.path.join(self.multiproc_dir, ARCHIVE_FILE)
+        archive = _read_json(archive_path) or {'pids': [], 'metrics': {}}
+        if dumped is not None:
+            merged = self._merged([archive['metrics'], dumped])
+            archive['metrics'] = {metric.name: metric.dump() for metric in merged}
+        # Readers skip the files of archived processes, so nothing is counted twice
+        archive['pids'].append(pid)
+        _write_json(archive_path, archive)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _merged(self, dumps):
+        with self._lock:
+            metrics = [metric.empty_copy() for metric in self._metrics]
+        for dumped in dumps:
+            for metric in metrics:
+                if metric.name in dumped:
+                    metric.load(dumped[metric.name])
+        return metrics
+
+    def _collect(self):
+        self.write()
+        archive = _read_json(os.path.join(self.multiproc_dir, ARCHIVE_FILE)) or {'pids': [], 'metrics': {}}
+        archived = {str(pid) for pid in archive['pids']}
+        dumps = [archive['metrics']]
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics_*.json')):
+            pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+            if pid.isdigit() and pid not in archived:
+                dumped = _read_json(path)
+                if dumped is not None:
+                    dumps.append(dumped)
+        return self._merged(dumps)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        if self.multiproc_dir:
+            metrics = self._collect()
+        else:
+            with self._lock:
+                metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry(
+    multiproc_dir=os.getenv("METRICS_MULTIPROC_DIR") or None,
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", str(DEFAULT_FLUSH_INTERVAL)))
+)
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', "Time to produce an HTTP response.", ('method', 'endpoint', 'status')))
+SERIALIZATION_SECONDS = REGISTRY.register(Histogram(
+    'response_serialization_duration_seconds', "Time to serialise analysis results to JSON.", ('endpoint',)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'pipeline_stage_duration_seconds', "Time spent in each analysis pipeline stage.", ('stage',)))
+STAGE_FAILURES = REGISTRY.register(Counter(
+    'pipeline_stage_failures_total', "Analysis pipeline stages that raised.", ('stage',)))
+OPENAI_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'openai_request_duration_seconds', "Time for each OpenAI chat completion (including retries).",
+    ('model', 'stream')))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    'openai_tokens_total', "OpenAI tokens used, by model and kind (prompt or completion).", ('model', 'kind')))
+OPENAI_COST = REGISTRY.register(Counter(
+    'openai_cost_usd_total', "Estimated OpenAI spend in USD (from MODEL_PRICES).", ('model',)))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'completion_cache_lookups_total', "Completion cache lookups, by result (hit or miss).", ('result',)))
+YOUTUBE_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'youtube_request_duration_seconds', "Time for each YouTube Data API request attempt.", ('method',)))
+YOUTUBE_QUOTA_UNITS = REGISTRY.register(Counter(
+    'youtube_quota_units_total', "YouTube Data API quota units spent, by method.", ('method',)))
+
+def model_price(model):
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    if not matches:
+        return None
+    return MODEL_PRICES[max(matches, key=len)]
+
+def record_openai_usage(model, prompt_tokens, completion_tokens):
+    """Count the tokens (and estimated cost) of one completion."""
+    OPENAI_TOKENS.inc(prompt_tokens, model=model, kind='prompt')
+    OPENAI_TOKENS.inc(completion_tokens, model=model, kind='completion')
+    price = model_price(model)
+    if price is not None:
+        OPENAI_COST.inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1000.0, model=model)
+
+# Time spent per step in the current request, shared with the worker
+# threads it starts (contexts are copied, the dict is not)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+class RequestTimings:
+    """Accumulated seconds per step for one request, in first-seen order."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self._durations[name] = self._durations.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        with self._lock:
+            items = list(self._durations.items())
+        items.append(('total', self.elapsed()))
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in items)
+
+def start_request():
+    """Begin collecting the per-request timing breakdown in this context."""
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+def request_timings():
+    return _request_timings.get()
+
+def record_timing(name, seconds):
+    """Add to the current request's breakdown, if a request is being timed."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+@contextlib.contextmanager
+def timed(histogram, timing_name=None, **labels):
+    """Observe the enclosed block's duration in `histogram` (and the request breakdown)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        if timing_name:
+            record_timing(timing_name, elapsed)
@@ -1,10 +1,18 @@
 # Backend Service: OpenAI Integration Service
 # This module handles all OpenAI API calls for summarization and analysis
 
-import time
+import os
+import threading
+from concurrent.futures import CancelledError
 from openai import OpenAI
 import httpx
 
+from services.comment_batching import COMMENT_SUMMARY_PROMPT
+from services.llm import chat_completion
+from services.pipeline import map_concurrently
+from services.retry import is_quota_error
+from services.summarization import summarize_transcript
+
 # Initialize OpenAI client with proper error handling
 openai_client_initialized = False
 client = None
@@ -19,7 +27,9 @@ def initialize_openai_client(api_key):
         else:
             client = OpenAI(
                 api_key=api_key,
-                http_client=httpx.Client()
+                http_client=httpx.Client(),
+                # Retries are handled by services.retry
+                max_retries=0
             )
             openai_client_initialized = True
             return True
@@ -29,92 +39,62 @@ def initialize_openai_client(api_key):
         return False
 
 def get_transcript_summary(transcript):
-    """Get a summary of the video transcript using OpenAI."""
+    """Get a summary of the video transcript (text or caption segments) using OpenAI."""
     # Check if OpenAI client is initialized
     if not openai_client_initialized or client is None:
         return "Transcript summary unavailable: OpenAI API is not configured."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Provide a detailed summary of the given youtube video transcript."},
-                {"role": "user", "content": transcript}
-            ]
-        )
-        return response.choices[0].message.content
+        return summarize_transcript(client, transcript, max_workers=int(os.getenv("OPENAI_MAX_CONCURRENCY", "4")))
     except Exception as e:
         print(f"Error in transcript summary: {e}")
         
         # Check if it's a quota exceeded error
-        error_str = str(e)
-        if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
+        if is_quota_error(e):
             return "Unable to generate transcript summary: OpenAI API quota exceeded. Please check your API key and billing details."
         
-        # For other errors, retry once after delay
-        time.sleep(60)  # Wait for 60 seconds before retrying
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Provide a detailed summary of the given youtube video transcript."},
-                    {"role": "user", "content": transcript}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as retry_error:
-            print(f"Retry failed: {retry_error}")
-            return "Unable to generate transcript summary due to API errors. Please try again later."
+        return "Unable to generate transcript summary due to API errors. Please try again later."
 
 def get_comments_summaries(batches):
-    """Get summaries of comment batches using OpenAI."""
-    summaries = []
-    quota_exceeded = False
-    
+    """Get summaries of comment batches using OpenAI.
+
+    Batches are summarised concurrently (at most OPENAI_MAX_CONCURRENCY at a
+    time, within the OPENAI_RPM / OPENAI_TPM limits) and the summaries come
+    back in batch order. Once the API reports that the quota is exhausted,
+    batches that have not been sent yet are cancelled.
+    """
     # Check if OpenAI client is initialized
     if not openai_client_initialized or client is None:
         return ["Comments summary unavailable: OpenAI API is not configured."]
 
-    for batch in batches:
+    quota_exceeded = threading.Event()
+
+    def summarize_batch(batch):
         # Skip processing if quota already exceeded
-        if quota_exceeded:
-            summaries.append("OpenAI API quota exceeded. Unable to process comments.")
-            continue
-            
+        if quota_exceeded.is_set():
+            return None
+        
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Summarize the following comments while keeping the detailed context."},
-                    {"role": "user", "content": " ".join(batch)}
-                ]
-            )
-            summaries.append(response.choices[0].message.content)
+            return chat_completion(client, [
+                {"role": "system", "content": COMMENT_SUMMARY_PROMPT},
+                {"role": "user", "content": " ".join(batch)}
+            ], cancel_event=quota_exceeded)
+        except CancelledError:
+            return None
         except Exception as e:
             print(f"Error in comment summary: {e}")
-            error_str = str(e)
             
             # Check if it's a quota exceeded error
-            if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
-                quota_exceeded = True
-                summaries.append("OpenAI API quota exceeded. Unable to process comments.")
-                continue
-                
-            # For other errors, retry once after delay
-            time.sleep(60)  # Wait for 60 seconds
-            try:
-                # Retry the current batch
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "Summarize the following comments while keeping the detailed context."},
-                        {"role": "user", "content": " ".join(batch)}
-                    ]
-                )
-                summaries.append(response.choices[0].message.content)
-            except Exception as retry_error:
-                print(f"Retry failed: {retry_error}")
-                summaries.append("Failed to summarize comments due to API errors.")
+            if is_quota_error(e):
+                quota_exceeded.set()
+                return None
+            
+            return "Failed to summarize comments due to API errors."
+
+    results = map_concurrently(summarize_batch, batches, max_workers=int(os.getenv("OPENAI_MAX_CONCURRENCY", "4")), stop_event=quota_exceeded)
+    summaries = [summary for summary in results if summary is not None]
+    if quota_exceeded.is_set():
+        summaries.append("OpenAI API quota exceeded. Unable to process comments.")
 
     return summaries
 
@@ -135,36 +115,18 @@ def create_final_summary(summaries, transcript_summary):
         
     summary_text = " ".join(summaries)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
-                {"role": "user", "content": summary_text}
-            ]
-        )
-        return response.choices[0].message.content
+        return chat_completion(client, [
+            {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
+            {"role": "user", "content": summary_text}
+        ])
     except Exception as e:
         print(f"Error in final summary: {e}")
-        error_str = str(e)
         
         # Check if it's a quota exceeded error
-        if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
+        if is_quota_error(e):
             return "Unable to generate analysis: OpenAI API quota exceeded. Please check your API key and billing details."
             
-        # For other errors, retry once after delay
-        time.sleep(60)  # Wait for 60 seconds before retrying
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"This is the summary of a YouTube video's transcript: {transcript_summary}. A user has commented on the video. Your task is to analyze this comment in the context of the video transcript. Based on the comment content and its relation to the transcript, please provide detailed insights, addressing these key points:\n1. Identify positive aspects of the video that the comment highlights and link these to specific parts of the transcript where possible.\n2. Identify any criticisms or areas for improvement mentioned in the comment, and relate these to relevant sections of the transcript.\n3. Based on the feedback or suggestions in the comment, recommend new content ideas or topics for future videos that align with the viewer's interests and the overall content strategy but don't make up things from your side unnecessarily. Ensure your analysis is clear and includes specific examples from both the comment and the transcript to support your insights."},
-                    {"role": "user", "content": summary_text}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as retry_error:
-            print(f"Retry failed: {retry_error}")
-            return "Unable to generate final analysis due to API errors. Please try again later."
+        return "Unable to generate final analysis due to API errors. Please try again later."
 
 def get_transcript(video_id):
     """Get transcript for a YouTube video."""
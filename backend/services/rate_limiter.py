@@ -0,0 +1,87 @@
+# Backend Service: Rate Limiter
+# This module keeps concurrent OpenAI calls under the account's
+# requests-per-minute and tokens-per-minute limits
+
+import os
+import threading
+import time
+
+class RateLimiter:
+    """Token-bucket limiter for requests and tokens per minute.
+
+    Both buckets refill continuously. A limit of 0 or None disables that
+    bucket. The limiter is shared by every thread in the process.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self._request_allowance = float(self.requests_per_minute)
+        self._token_allowance = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                self.requests_per_minute,
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _wait_time(self, tokens):
+        wait = 0.0
+        if self.requests_per_minute and self._request_allowance < 1:
+            wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._token_allowance < tokens:
+            wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, tokens=0, cancel_event=None):
+        """Block until one request using `tokens` tokens may be sent.
+
+        Returns False without consuming anything if `cancel_event` is set
+        while waiting, True otherwise.
+        """
+        if self.tokens_per_minute:
+            # A single request larger than the whole budget can still go out
+            # once the bucket is full
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return True
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+_openai_limiter = None
+_openai_limiter_lock = threading.Lock()
+
+def get_openai_limiter():
+    """Lazily create the process-wide OpenAI limiter from OPENAI_RPM / OPENAI_TPM."""
+    global _openai_limiter
+    if _openai_limiter is None:
+        with _openai_limiter_lock:
+            if _openai_limiter is None:
+                _openai_limiter = RateLimiter(
+                    requests_per_minute=int(os.getenv("OPENAI_RPM", "0")),
+                    tokens_per_minute=int(os.getenv("OPENAI_TPM", "0"))
+                )
+    return _openai_limiter
@@ -0,0 +1,136 @@
+# Backend Service: Analysis Result Store
+# This module persists finished analyses in a local SQLite file so that
+# GET /api/results can serve them without re-running the whole pipeline
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Bump this whenever the result shape, prompts or models change so that
+# results produced by an older pipeline are no longer served
+ANALYSIS_VERSION = 2
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'results.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    video_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    options TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (video_id, version, options)
+)
+"""
+
+def options_key(options):
+    """Canonical string for a dict of analysis options (e.g. sampling strategy)."""
+    return json.dumps(options or {}, sort_keys=True, separators=(',', ':'))
+
+class ResultStore:
+    """SQLite-backed store of analysis results keyed by (videoId, version, options).
+
+    `options` are the settings the result depends on, as a dict; results
+    for other options are stored separately.
+
+    Entries older than `ttl` seconds are treated as missing, and once the
+    store holds more than `max_entries` rows the least recently used ones
+    are evicted.
+    """
+
+    def __init__(self, path, ttl=86400, max_entries=1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(results)")]
+            # Stored results are only a cache, so a table from before options
+            # were part of the key is dropped rather than migrated
+            if columns and 'options' not in columns:
+                conn.execute("DROP TABLE results")
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, video_id, options=None, version=ANALYSIS_VERSION):
+        """Return the stored result for a video and options, or None if missing or expired."""
+        now = time.time()
+        key = (video_id, version, options_key(options))
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT payload, created_at FROM results WHERE video_id = ? AND version = ? AND options = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        payload, created_at = row
+        if self.ttl and now - created_at > self.ttl:
+            with conn:
+                conn.execute("DELETE FROM results WHERE video_id = ? AND version = ? AND options = ?", key)
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE results SET last_access = ? WHERE video_id = ? AND version = ? AND options = ?",
+                (now,) + key
+            )
+        return json.loads(payload)
+
+    def put(self, video_id, result, options=None, version=ANALYSIS_VERSION):
+        """Store a result, replacing any earlier one for the same video, options and version."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (video_id, version, options, payload, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, version, options_key(options), json.dumps(result), now, now)
+            )
+            self._evict(conn, now)
+
+    def delete(self, video_id, options=None, version=ANALYSIS_VERSION):
+        """Remove a stored result."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM results WHERE video_id = ? AND version = ? AND options = ?",
+                (video_id, version, options_key(options))
+            )
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM results WHERE rowid IN ("
+                "SELECT rowid FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store():
+    """Lazily create the shared result store from environment settings."""
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                _result_store = ResultStore(
+                    os.getenv("RESULT_STORE_PATH", DEFAULT_STORE_PATH),
+                    ttl=int(os.getenv("RESULT_STORE_TTL", "86400")),
+                    max_entries=int(os.getenv("RESULT_STORE_MAX_ENTRIES", "1000"))
+                )
+    return _result_store
@@ -0,0 +1,179 @@
+# Backend Service: Retry Policy
+# This module holds the single retry/backoff policy used for every OpenAI
+# and YouTube call, plus the per-request deadline those retries respect
+
+import contextlib
+import contextvars
+import email.utils
+import os
+import random
+import socket
+import time
+from concurrent.futures import CancelledError
+
+from services.youtube_quota import QuotaExhaustedError
+
+try:
+    import httpx
+except ImportError:  # httpx ships with the openai client, but stay importable without it
+    httpx = None
+
+# HTTP statuses worth trying again: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Monotonic time by which the current request must finish, or None
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+@contextlib.contextmanager
+def deadline_scope(seconds):
+    """Give the enclosed work (and stages it submits) `seconds` to finish.
+
+    An existing, tighter deadline is kept.
+    """
+    deadline = time.monotonic() + seconds if seconds else None
+    current = _deadline.get()
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time():
+    """Seconds left before the current request's deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def is_quota_error(error):
+    """True if the error means the API quota is used up, so retrying can't help."""
+    if isinstance(error, QuotaExhaustedError):
+        return True
+    error_str = str(error)
+    return (
+        "insufficient_quota" in error_str
+        or "exceeded your current quota" in error_str
+        or "quotaExceeded" in error_str
+        or "dailyLimitExceeded" in error_str
+    )
+
+def _status_code(error):
+    # openai.APIStatusError exposes status_code, googleapiclient's HttpError a resp
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        resp = getattr(error, 'resp', None)
+        status = getattr(resp, 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _response_headers(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers is None:
+        # httplib2.Response is itself a dict of lower-cased headers
+        resp = getattr(error, 'resp', None)
+        if isinstance(resp, dict):
+            headers = resp
+    return headers or {}
+
+def retry_after(error):
+    """Delay in seconds requested by the server's Retry-After header, if any."""
+    headers = _response_headers(error)
+    try:
+        value = headers.get('retry-after-ms')
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get('retry-after') or headers.get('Retry-After')
+    except Exception:
+        return None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+def is_retryable(error):
+    """True for transient failures: rate limits, server errors, dropped connections."""
+    if is_quota_error(error):
+        return False
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    # openai wraps transport failures in APIConnectionError / APITimeoutError
+    if type(error).__name__ in ('APIConnectionError', 'APITimeoutError'):
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError, socket.timeout))
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After.
+
+    The n-th retry waits a random time up to base_delay * 2**n (capped at
+    max_delay), unless the server asked for a specific delay.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay_for(self, attempt, error):
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, *args, cancel_event=None, **kwargs):
+        """Call `func`, retrying transient failures.
+
+        The last error is re-raised when it is not retryable, the attempts
+        are used up, or waiting would run past the request deadline. Waiting
+        only blocks the calling thread; if `cancel_event` is set while
+        waiting, CancelledError is raised instead.
+        """
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    raise
+                delay = self.delay_for(attempt - 1, e)
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise
+                print(f"Retrying after error ({attempt}/{self.max_attempts - 1}) in {delay:.1f}s: {e}")
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise CancelledError()
+            else:
+                time.sleep(delay)
+
+_default_policy = None
+
+def get_retry_policy():
+    """Lazily create the shared policy from RETRY_MAX_ATTEMPTS / RETRY_BASE_DELAY / RETRY_MAX_DELAY."""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = RetryPolicy(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", "1.0")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", "30.0"))
+        )
+    return _default_policy
+
+def retry_call(func, *args, policy=None, cancel_event=None, **kwargs):
+    """Call `func` under the shared retry policy."""
+    return (policy or get_retry_policy()).call(func, *args, cancel_event=cancel_event, **kwargs)
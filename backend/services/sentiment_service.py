@@ -1,11 +1,22 @@
 # Backend Service: Sentiment Analysis Service
 # This module handles sentiment analysis of comments using transformers
 
+import os
+
 from transformers import pipeline
 
 # Initialize the sentiment analysis pipeline lazily with error handling
 sentiment_analyzer = None
 
+# Comments per forward pass unless SENTIMENT_BATCH_SIZE says otherwise
+DEFAULT_BATCH_SIZE = 32
+
+# Fallback when the tokenizer doesn't report a usable limit (DistilBERT's is 512)
+DEFAULT_MAX_LENGTH = 512
+
+# Using the same threshold as in the original code (0.9)
+CONFIDENCE_THRESHOLD = 0.9
+
 def get_sentiment_analyzer():
     """Lazy load the sentiment analyzer on first use."""
     global sentiment_analyzer
@@ -17,53 +28,84 @@ def get_sentiment_analyzer():
             print("Sentiment analysis will be disabled.")
     return sentiment_analyzer
 
-def analyze_sentiment(comments):
-    """Analyze the sentiment of comments."""
+def _model_max_length(analyzer):
+    # Tokenizers without a configured limit report a huge sentinel value
+    max_length = getattr(getattr(analyzer, 'tokenizer', None), 'model_max_length', None)
+    if not max_length or max_length > 100000:
+        return DEFAULT_MAX_LENGTH
+    return max_length
+
+def _classify(output):
+    if output is None:
+        return {'label': 'neutral', 'score': 0.0}
+    if output['label'] == 'POSITIVE' and output['score'] > CONFIDENCE_THRESHOLD:
+        label = 'positive'
+    elif output['label'] == 'NEGATIVE' and output['score'] > CONFIDENCE_THRESHOLD:
+        label = 'negative'
+    else:
+        label = 'neutral'
+    return {'label': label, 'score': float(output['score'])}
+
+def score_comments(comments, batch_size=None):
+    """Classify each comment with the transformer model.
+
+    Returns one {'label', 'score'} dict per comment, in input order, where
+    label is 'positive', 'negative' or 'neutral' and score is the model's
+    confidence. Comments are sorted by length before batching so each
+    forward pass pads as little as possible, and inputs longer than the
+    model's limit are truncated.
+    """
     if not comments:
-        return {
-            'positive': 0,
-            'negative': 0,
-            'neutral': 0
-        }
-    
-    sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-    
-    for comment in comments:
+        return []
+
+    analyzer = get_sentiment_analyzer()
+    if analyzer is None:
+        # If sentiment analyzer is not available, skip sentiment analysis
+        return [_classify(None) for _ in comments]
+
+    batch_size = batch_size or int(os.getenv("SENTIMENT_BATCH_SIZE", str(DEFAULT_BATCH_SIZE)))
+    max_length = _model_max_length(analyzer)
+    order = sorted(range(len(comments)), key=lambda i: len(comments[i]))
+    scores = [None] * len(comments)
+
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
         try:
-            # Process comments in batches to avoid rate limits
-            analyzer = get_sentiment_analyzer()
-            if analyzer is None:
-                # If sentiment analyzer is not available, skip sentiment analysis
-                sentiment_counts['neutral'] += 1
-                continue
-                
-            result = analyzer(comment)
-            sentiment = result[0]
-            
-            # Using the same threshold as in the original code (0.9)
-            if sentiment['label'] == 'POSITIVE' and sentiment['score'] > 0.9:
-                sentiment_counts['positive'] += 1
-            elif sentiment['label'] == 'NEGATIVE' and sentiment['score'] > 0.9:
-                sentiment_counts['negative'] += 1
-            else:
-                sentiment_counts['neutral'] += 1
-                
+            outputs = analyzer(
+                [comments[i] for i in indices],
+                batch_size=len(indices),
+                truncation=True,
+                max_length=max_length
+            )
         except Exception as e:
             print(f"Error in sentiment analysis: {e}")
-            sentiment_counts['neutral'] += 1
-    
+            outputs = [None] * len(indices)
+        for index, output in zip(indices, outputs):
+            scores[index] = _classify(output)
+
+    return scores
+
+def sentiment_percentages(scores):
+    """Turn per-comment scores into positive/negative/neutral percentages."""
+    sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    for score in scores:
+        sentiment_counts[score['label']] += 1
+
     # Calculate percentages instead of raw counts
     total = sum(sentiment_counts.values())
     if total > 0:
-        sentiment_percentages = {
+        return {
             'positive': (sentiment_counts['positive'] / total) * 100,
             'negative': (sentiment_counts['negative'] / total) * 100,
             'neutral': (sentiment_counts['neutral'] / total) * 100
         }
-        return sentiment_percentages
     else:
         return {
             'positive': 0,
             'negative': 0,
             'neutral': 0
         }
+
+def analyze_sentiment(comments, batch_size=None):
+    """Analyze the sentiment of comments."""
+    return sentiment_percentages(score_comments(comments, batch_size=batch_size))
@@ -0,0 +1,170 @@
+# Backend Service: Transcript Summarisation
+# This module summarises transcripts of any length: short ones in a single
+# request, long ones map-reduce style over token-budgeted chunks
+
+import os
+import threading
+from concurrent.futures import CancelledError
+
+from services.comment_batching import COMPLETION_RESERVE
+from services.llm import chat_completion
+from services.pipeline import map_concurrently
+from services.tokenizer import context_window, count_message_tokens, count_tokens, get_model, split_by_tokens
+from services.transcript_store import format_timestamp
+
+# Seconds between "[m:ss]" position markers in transcript text
+DEFAULT_MARKER_INTERVAL = 60
+
+# Tokens counted per marker, a little over what "[1:02:03] " takes
+MARKER_TOKENS = 8
+
+TIMESTAMP_NOTE = " Markers like [2:00] give positions in the video; cite them for the key points."
+
+TRANSCRIPT_SUMMARY_PROMPT = "Provide a detailed summary of the given youtube video transcript." + TIMESTAMP_NOTE
+CHUNK_SUMMARY_PROMPT = (
+    "Provide a detailed summary of the given part of a youtube video transcript. "
+    "It is one of several consecutive parts, so don't add an introduction or conclusion." + TIMESTAMP_NOTE
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of a youtube video transcript, in order. "
+    "Combine them into one detailed summary of the whole video, keeping the [m:ss] positions they cite."
+)
+
+def _budget(prompt, model):
+    overhead = count_message_tokens([
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": ""}
+    ], model)
+    budget = context_window(model) - overhead - COMPLETION_RESERVE
+    cap = int(os.getenv("TRANSCRIPT_CHUNK_MAX_TOKENS", "0"))
+    if cap:
+        budget = min(budget, cap)
+    return max(1, budget)
+
+def chunk_segments(segments, max_tokens, model=None, marker_interval=None):
+    """Group consecutive transcript segments into chunks of at most `max_tokens`.
+
+    Chunks break on segment boundaries; only a single segment longer than
+    the budget is cut inside its text. Segments with a `start` get a
+    "[m:ss]" marker at the start of each chunk and then every
+    `marker_interval` seconds, so summaries can cite positions in the video.
+    """
+    model = model or get_model()
+    if marker_interval is None:
+        marker_interval = int(os.getenv("TRANSCRIPT_TIMESTAMP_INTERVAL", str(DEFAULT_MARKER_INTERVAL)))
+    chunks = []
+    current = []
+    current_tokens = 0
+    last_marker = None
+    for segment in segments:
+        text = segment['text'].strip()
+        if not text:
+            continue
+        start = segment.get('start')
+        marked = start is not None and marker_interval > 0 and (
+            not current or last_marker is None or start - last_marker >= marker_interval
+        )
+        size = count_tokens(text, model) + 1
+        if marked:
+            size += MARKER_TOKENS
+        if size > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            pieces = split_by_tokens(text, max_tokens - 1 - (MARKER_TOKENS if start is not None else 0), model)
+            if start is not None and marker_interval > 0:
+                pieces = [f"[{format_timestamp(start)}] {piece}" for piece in pieces]
+                last_marker = start
+            chunks.extend(pieces)
+            continue
+        if current_tokens + size > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+            if start is not None and marker_interval > 0 and not marked:
+                marked = True
+                size += MARKER_TOKENS
+        if marked:
+            text = f"[{format_timestamp(start)}] {text}"
+            last_marker = start
+        current.append(text)
+        current_tokens += size
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def _group_in_order(texts, max_tokens, model):
+    # Consecutive runs of texts that fit in one request, always at least two
+    # per group so every reduce round shrinks the list
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        size = count_tokens(text, model) + 2
+        if current and current_tokens + size > max_tokens and len(current) >= 2:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += size
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
+
+def summarize_transcript(client, transcript, max_workers=4, model=None):
+    """Summarise a transcript given as text or as a list of caption segments.
+
+    If it fits in one request it is summarised directly. Otherwise it is
+    split on segment boundaries into chunks that are summarised in
+    parallel, and the partial summaries are combined hierarchically until
+    one remains. API errors are raised to the caller.
+    """
+    model = model or get_model()
+    if isinstance(transcript, str):
+        segments = [{'text': transcript}]
+    else:
+        segments = transcript
+
+    # A single chunk is sent with TRANSCRIPT_SUMMARY_PROMPT and several with
+    # CHUNK_SUMMARY_PROMPT, so chunks must fit alongside either
+    budget = min(_budget(TRANSCRIPT_SUMMARY_PROMPT, model), _budget(CHUNK_SUMMARY_PROMPT, model))
+    chunks = chunk_segments(segments, budget, model)
+    if len(chunks) <= 1:
+        return chat_completion(client, [
+            {"role": "system", "content": TRANSCRIPT_SUMMARY_PROMPT},
+            {"role": "user", "content": chunks[0] if chunks else ""}
+        ], model=model)
+
+    failed = threading.Event()
+    errors = []
+
+    def summarize(prompt, text):
+        if failed.is_set():
+            return None
+        try:
+            return chat_completion(client, [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": text}
+            ], model=model, cancel_event=failed)
+        except CancelledError:
+            return None
+        except Exception as e:
+            # One missing part would leave a hole in the summary, so stop
+            errors.append(e)
+            failed.set()
+            return None
+
+    def run_round(prompt, texts):
+        results = map_concurrently(lambda text: summarize(prompt, text), texts,
+                                   max_workers=max_workers, stop_event=failed)
+        if errors:
+            raise errors[0]
+        return results
+
+    summaries = run_round(CHUNK_SUMMARY_PROMPT, chunks)
+    reduce_budget = _budget(REDUCE_PROMPT, model)
+    while len(summaries) > 1:
+        groups = _group_in_order(summaries, reduce_budget, model)
+        summaries = run_round(REDUCE_PROMPT, ["\n\n".join(group) for group in groups])
+    return summaries[0]
@@ -0,0 +1,111 @@
+# Backend Service: Token Counting
+# This module counts tokens the way the OpenAI models do (via tiktoken when
+# it is installed) so batches and chunks can be sized to a model's context
+
+import functools
+import math
+import os
+import re
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Context window (prompt + completion) per model family, longest prefix wins
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-3.5-turbo-instruct': 4096,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4o': 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Fixed per-message and per-reply overhead of the chat format
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+_WORD_RE = re.compile(r"\S+")
+
+def get_model():
+    """The chat model to use, from OPENAI_MODEL."""
+    return os.getenv("OPENAI_MODEL", DEFAULT_MODEL)
+
+def context_window(model=None):
+    """Number of tokens the model accepts for prompt and completion together."""
+    model = model or get_model()
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(model=None):
+    """Return the tiktoken encoder for a model, or None if tiktoken is unavailable.
+
+    Loading an encoding may need to download its vocabulary, so any failure
+    falls back to estimation rather than failing the request. The result
+    (including a failure) is cached per model.
+    """
+    model = model or get_model()
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Could not load tokenizer for {model}, estimating token counts: {e}")
+        return None
+
+def estimate_tokens(text):
+    """Approximate token count without a tokenizer (about four characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+def count_tokens(text, model=None):
+    """Number of tokens `text` uses for the given model."""
+    encoder = get_encoder(model or get_model())
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages, model=None):
+    """Number of prompt tokens a list of chat messages uses."""
+    return sum(
+        TOKENS_PER_MESSAGE + count_tokens(message["content"], model)
+        for message in messages
+    ) + TOKENS_PER_REPLY
+
+def split_by_tokens(text, max_tokens, model=None):
+    """Split text into pieces of at most `max_tokens` tokens each."""
+    encoder = get_encoder(model or get_model())
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return [encoder.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+    # Without a tokenizer, cut on whitespace using the same estimate
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in _WORD_RE.findall(text):
+        word_tokens = estimate_tokens(word + " ")
+        if word_tokens > max_tokens:
+            # A single enormous "word" (e.g. a URL or spam) is cut by length
+            if current:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            step = max_tokens * 4
+            pieces.extend(word[i:i + step] for i in range(0, len(word), step))
+            continue
+        if current_tokens + word_tokens > max_tokens and current:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
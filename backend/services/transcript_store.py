@@ -0,0 +1,187 @@
+# Backend Service: Transcript Store
+# This module keeps fetched caption transcripts in a local SQLite file as
+# zlib-compressed blocks of timed segments, so re-analyses skip the caption
+# fetch and a time range can be read without decompressing the rest
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_TRANSCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'transcripts.db')
+
+# Segments are grouped into blocks by start time, this many seconds each
+BLOCK_SECONDS = 120
+
+# Videos without captions are checked again after a day, as automatic
+# captions often appear some time after upload
+EMPTY_TTL = 86400
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS transcripts (
+        video_id TEXT PRIMARY KEY,
+        segment_count INTEGER NOT NULL,
+        duration REAL NOT NULL,
+        raw_bytes INTEGER NOT NULL,
+        stored_bytes INTEGER NOT NULL,
+        fetched_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transcript_blocks (
+        video_id TEXT NOT NULL,
+        block INTEGER NOT NULL,
+        start REAL NOT NULL,
+        end REAL NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (video_id, block)
+    )
+    """,
+]
+
+def _encode(segments):
+    return zlib.compress(json.dumps(
+        [[s['start'], s['duration'], s['text']] for s in segments], separators=(',', ':')
+    ).encode('utf-8'))
+
+def _decode(data):
+    return [{'text': text, 'start': start, 'duration': duration}
+            for start, duration, text in json.loads(zlib.decompress(data))]
+
+def format_timestamp(seconds):
+    """Video position as m:ss, or h:mm:ss from an hour on."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+_TIMESTAMP_RE = re.compile(r"(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d+)?)", re.ASCII)
+
+def parse_timestamp(value):
+    """Seconds from a position given as seconds ("150") or [h:]m:ss ("2:30").
+
+    Minutes and seconds after the first field must be below 60; anything
+    else (negative, nan, inf, exponents) raises ValueError.
+    """
+    match = _TIMESTAMP_RE.fullmatch(str(value).strip())
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {value}")
+    hours, minutes, seconds = match.groups()
+    fields = [int(part) for part in (hours, minutes) if part is not None] + [float(seconds)]
+    if any(part >= 60 for part in fields[1:]):
+        raise ValueError(f"Invalid timestamp: {value}")
+    total = 0.0
+    for part in fields:
+        total = total * 60 + part
+    return total
+
+class TranscriptStore:
+    """SQLite store of caption segments ({'text', 'start', 'duration'}) per video.
+
+    Transcripts older than `ttl` seconds (EMPTY_TTL for videos without
+    captions) are treated as missing. Each lookup, whole transcript or time
+    range, is one query, and a range only decompresses the blocks it
+    overlaps.
+    """
+
+    def __init__(self, path, ttl=30 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, video_id, start=None, end=None):
+        """Return a video's stored segments, or None if it isn't stored (or expired).
+
+        With `start` and/or `end` (seconds), only segments overlapping that
+        range are returned.
+        """
+        range_start = float('-inf') if start is None else start
+        range_end = float('inf') if end is None else end
+        rows = self._connect().execute(
+            "SELECT t.segment_count, t.fetched_at, b.data FROM transcripts t "
+            "LEFT JOIN transcript_blocks b ON b.video_id = t.video_id AND b.end > ? AND b.start < ? "
+            "WHERE t.video_id = ? ORDER BY b.block",
+            (range_start, range_end, video_id)
+        ).fetchall()
+        if not rows:
+            return None
+        segment_count, fetched_at = rows[0][0], rows[0][1]
+        ttl = self.ttl if segment_count else min(self.ttl or EMPTY_TTL, EMPTY_TTL)
+        if ttl and time.time() - fetched_at > ttl:
+            return None
+        segments = []
+        for _, _, data in rows:
+            if data is None:
+                continue
+            for segment in _decode(data):
+                if segment['start'] < range_end and segment['start'] + segment['duration'] > range_start:
+                    segments.append(segment)
+        return segments
+
+    def put(self, video_id, segments):
+        """Store a video's segments (an empty list records that it has no captions)."""
+        segments = sorted(
+            ({'text': s['text'], 'start': float(s.get('start', 0)), 'duration': float(s.get('duration', 0))}
+             for s in segments),
+            key=lambda s: s['start']
+        )
+        blocks = {}
+        for segment in segments:
+            blocks.setdefault(int(segment['start'] // BLOCK_SECONDS), []).append(segment)
+        rows = []
+        raw_bytes = stored_bytes = 0
+        for block, members in sorted(blocks.items()):
+            data = _encode(members)
+            raw_bytes += sum(len(s['text'].encode('utf-8')) for s in members)
+            stored_bytes += len(data)
+            rows.append((video_id, block, members[0]['start'],
+                         max(s['start'] + s['duration'] for s in members), data))
+        duration = max((s['start'] + s['duration'] for s in segments), default=0.0)
+
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM transcript_blocks WHERE video_id = ?", (video_id,))
+            conn.executemany(
+                "INSERT INTO transcript_blocks (video_id, block, start, end, data) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, segment_count, duration, raw_bytes, stored_bytes, "
+                "fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, len(segments), duration, raw_bytes, stored_bytes, time.time())
+            )
+
+_transcript_store = None
+_transcript_store_lock = threading.Lock()
+
+def get_transcript_store():
+    """Lazily create the shared transcript store from environment settings."""
+    global _transcript_store
+    if _transcript_store is None:
+        with _transcript_store_lock:
+            if _transcript_store is None:
+                _transcript_store = TranscriptStore(
+                    os.getenv("TRANSCRIPT_STORE_PATH", DEFAULT_TRANSCRIPT_PATH),
+                    ttl=int(os.getenv("TRANSCRIPT_STORE_TTL", str(30 * 86400)))
+                )
+    return _transcript_store
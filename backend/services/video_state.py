@@ -0,0 +1,169 @@
+# Backend Service: Video Analysis State
+# This module remembers, per video, which comments have already been
+# analysed along with the running comment summary and sentiment counts, so
+# a re-analysis only has to fetch and summarise what is new
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from services.result_store import ANALYSIS_VERSION, options_key
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'video_state.db')
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS video_state (
+        video_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        options TEXT NOT NULL DEFAULT '',
+        comment_summary TEXT NOT NULL,
+        sentiment_counts TEXT NOT NULL,
+        comment_count INTEGER NOT NULL,
+        newest_published_at TEXT,
+        full_analysis_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS seen_comments (
+        video_id TEXT NOT NULL,
+        comment_id TEXT NOT NULL,
+        published_at TEXT,
+        PRIMARY KEY (video_id, comment_id)
+    )
+    """,
+]
+
+class VideoState:
+    """What an earlier analysis of a video already covered."""
+
+    def __init__(self, video_id, comment_summary, sentiment_counts, comment_count,
+                 newest_published_at, seen_ids, updated_at=None):
+        self.video_id = video_id
+        self.comment_summary = comment_summary
+        self.sentiment_counts = sentiment_counts
+        self.comment_count = comment_count
+        self.newest_published_at = newest_published_at
+        self.seen_ids = seen_ids
+        self.updated_at = updated_at
+
+class VideoStateStore:
+    """SQLite store of per-video analysis state.
+
+    State written by an older ANALYSIS_VERSION or with other analysis
+    options (sampling strategy, replies) is ignored, and state whose last
+    full analysis is more than `ttl` seconds old is treated as missing, so
+    videos are still re-analysed in full from time to time.
+    """
+
+    def __init__(self, path, ttl=7 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(video_state)")]
+            if 'options' not in columns:
+                # State from before options were recorded matches no options,
+                # so those videos get one full re-analysis
+                conn.execute("ALTER TABLE video_state ADD COLUMN options TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Transactions are opened explicitly (see save())
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, video_id, options=None):
+        """Return the stored VideoState for a video analysed with `options`, or None."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT comment_summary, sentiment_counts, comment_count, newest_published_at, "
+            "full_analysis_at, updated_at "
+            "FROM video_state WHERE video_id = ? AND version = ? AND options = ?",
+            (video_id, ANALYSIS_VERSION, options_key(options))
+        ).fetchone()
+        if row is None:
+            return None
+        comment_summary, sentiment_counts, comment_count, newest_published_at, full_analysis_at, updated_at = row
+        if self.ttl and time.time() - full_analysis_at > self.ttl:
+            return None
+        seen_ids = {
+            comment_id for (comment_id,) in
+            conn.execute("SELECT comment_id FROM seen_comments WHERE video_id = ?", (video_id,))
+        }
+        return VideoState(video_id, comment_summary, json.loads(sentiment_counts), comment_count,
+                          newest_published_at, seen_ids, updated_at)
+
+    def save(self, video_id, comments, comment_summary, sentiment_counts, comment_count, replace=False,
+             options=None):
+        """Record newly analysed comments and the updated running totals.
+
+        `comments` are dicts with 'id' and 'publishedAt' (and 'parentId' for
+        replies). With `replace`, the comments seen before are forgotten
+        (used after a full analysis). `options` are the analysis options the
+        state was built with.
+        """
+        now = time.time()
+        conn = self._connect()
+        # Take the write lock before the first read: in WAL mode a read
+        # transaction that later tries to write fails with "database is
+        # locked" straight away instead of waiting for the timeout
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            full_analysis_at = now
+            if replace:
+                conn.execute("DELETE FROM seen_comments WHERE video_id = ?", (video_id,))
+            else:
+                row = conn.execute(
+                    "SELECT full_analysis_at FROM video_state WHERE video_id = ?", (video_id,)
+                ).fetchone()
+                if row is not None:
+                    full_analysis_at = row[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen_comments (video_id, comment_id, published_at) VALUES (?, ?, ?)",
+                # Replies to older threads can be newer than the newest
+                # top-level comment, so only top-level ones mark how far
+                # the comments have been read
+                [(video_id, c['id'], None if c.get('parentId') else c.get('publishedAt'))
+                 for c in comments if c.get('id')]
+            )
+            newest = conn.execute(
+                "SELECT MAX(published_at) FROM seen_comments WHERE video_id = ?", (video_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO video_state (video_id, version, options, comment_summary, sentiment_counts, "
+                "comment_count, newest_published_at, full_analysis_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, ANALYSIS_VERSION, options_key(options), comment_summary, json.dumps(sentiment_counts),
+                 comment_count, newest, full_analysis_at, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+_video_state_store = None
+_video_state_lock = threading.Lock()
+
+def get_video_state_store():
+    """Lazily create the shared video state store from environment settings."""
+    global _video_state_store
+    if _video_state_store is None:
+        with _video_state_lock:
+            if _video_state_store is None:
+                _video_state_store = VideoStateStore(
+                    os.getenv("VIDEO_STATE_PATH", DEFAULT_STATE_PATH),
+                    ttl=int(os.getenv("VIDEO_STATE_TTL", str(7 * 86400)))
+                )
+    return _video_state_store
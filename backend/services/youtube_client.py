@@ -0,0 +1,173 @@
+# Backend Service: YouTube Client
+# This module hands out long-lived YouTube Data API clients so requests
+# don't rebuild the API from its discovery document and reconnect each time
+
+import contextlib
+import json
+import os
+import threading
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+from services.metrics import YOUTUBE_QUOTA_UNITS, YOUTUBE_REQUEST_SECONDS, timed
+from services.retry import is_quota_error, retry_call
+from services.youtube_quota import QuotaExhaustedError, get_quota_budget
+
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+
+DEFAULT_DISCOVERY_CACHE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'youtube_v3_discovery.json'
+)
+
+# Quota units per request for methods that don't cost the default 1
+QUOTA_COSTS = {
+    'search.list': 100,
+    'videos.insert': 1600,
+    'commentThreads.insert': 50,
+    'comments.insert': 50,
+}
+
+# Parsed discovery document, shared by every thread
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+# Idle clients kept per API key; more are built when more threads need one
+# at the same time, and those beyond this many are dropped when returned
+DEFAULT_POOL_SIZE = 16
+
+# httplib2.Http is not thread-safe, so a client (and its keep-alive
+# connection) is checked out by one thread at a time. The pool lives as long
+# as the process, as analyses run on short-lived pipeline threads.
+_pool = {}
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _load_discovery_document(offline=False):
+    cache_path = os.getenv("YOUTUBE_DISCOVERY_CACHE", DEFAULT_DISCOVERY_CACHE)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    content = None
+    try:
+        # google-api-python-client 2.x ships the document with the package
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc('youtube', 'v3')
+    except ImportError:
+        pass
+    if content is None:
+        if offline:
+            return None
+        resp, content = httplib2.Http(timeout=30).request(DISCOVERY_URL)
+        if resp.status != 200:
+            raise RuntimeError(f"Failed to fetch YouTube discovery document: HTTP {resp.status}")
+        content = content.decode('utf-8')
+
+    doc = json.loads(content)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(doc, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not cache YouTube discovery document: {e}")
+    return doc
+
+def get_discovery_document(offline=False):
+    """Return the parsed YouTube v3 discovery document, loading it once per process.
+
+    With `offline`, returns None instead of downloading it when there is no
+    local copy.
+    """
+    global _discovery_doc
+    if _discovery_doc is None:
+        with _discovery_lock:
+            if _discovery_doc is None:
+                _discovery_doc = _load_discovery_document(offline)
+    return _discovery_doc
+
+def _build_client(api_key):
+    http = httplib2.Http(timeout=float(os.getenv("YOUTUBE_HTTP_TIMEOUT", "30")))
+    # YOUTUBE_API_BASE_URL points the client elsewhere, e.g. tools/standin_apis.py
+    base_url = os.getenv("YOUTUBE_API_BASE_URL")
+    client_options = {'api_endpoint': base_url} if base_url else None
+    return build_from_document(get_discovery_document(), developerKey=api_key, http=http,
+                               client_options=client_options)
+
+@contextlib.contextmanager
+def youtube_client(api_key):
+    """Check out an idle YouTube client for `api_key` from the process-wide pool.
+
+    The client is returned to the pool when the block exits, so requests
+    built from it must be executed inside the block.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Connections opened before a fork must not be shared with the child
+        if _pool_pid != os.getpid():
+            _pool, _pool_pid = {}, os.getpid()
+        idle = _pool.setdefault(api_key, [])
+        youtube = idle.pop() if idle else None
+    if youtube is None:
+        youtube = _build_client(api_key)
+    try:
+        yield youtube
+    finally:
+        with _pool_lock:
+            idle = _pool.get(api_key) if _pool_pid == os.getpid() else None
+            if idle is not None and len(idle) < int(os.getenv("YOUTUBE_CLIENT_POOL_SIZE", str(DEFAULT_POOL_SIZE))):
+                idle.append(youtube)
+
+def quota_cost(method):
+    """YouTube Data API quota units one request to `method` costs."""
+    return QUOTA_COSTS.get(method, 1)
+
+def execute_request(request, cancel_event=None, api_key=None):
+    """Execute a YouTube API request with the shared retry policy.
+
+    Every attempt is timed and its quota units counted (against `api_key`
+    in the daily budget when given), since failed requests are charged too.
+    """
+    # methodId looks like "youtube.commentThreads.list"
+    method = getattr(request, 'methodId', '') or 'unknown'
+    method = method.split('.', 1)[1] if method.startswith('youtube.') else method
+
+    def attempt():
+        YOUTUBE_QUOTA_UNITS.inc(quota_cost(method), method=method)
+        if api_key:
+            get_quota_budget().spend(api_key, quota_cost(method))
+        with timed(YOUTUBE_REQUEST_SECONDS, 'youtube', method=method):
+            return request.execute()
+
+    return retry_call(attempt, cancel_event=cancel_event)
+
+def call_youtube(build, cancel_event=None):
+    """Execute a request on a key from the pool (see services.youtube_quota).
+
+    `build(youtube)` makes the request from a client, e.g.
+    ``lambda youtube: youtube.videos().list(part="snippet", id=video_id)``.
+    The key with the most quota left is used; if the API says its quota is
+    exceeded it is marked as used up for the day and the next key tried.
+    Raises QuotaExhaustedError once no key is left.
+    """
+    budget = get_quota_budget()
+    if not budget.keys:
+        raise RuntimeError("No YouTube API key configured (YOUTUBE_API_KEYS or YOUTUBE_API_KEY)")
+    tried = set()
+    while True:
+        api_key = budget.pick_key(exclude=tried)
+        if api_key is None:
+            raise QuotaExhaustedError()
+        try:
+            with youtube_client(api_key) as youtube:
+                return execute_request(build(youtube), cancel_event=cancel_event, api_key=api_key)
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            print(f"YouTube API key {len(tried) + 1} of {len(budget.keys)} is out of quota, rotating: {e}")
+            budget.mark_exhausted(api_key)
+            tried.add(api_key)
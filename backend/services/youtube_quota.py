@@ -0,0 +1,199 @@
+# Backend Service: YouTube Quota Budget
+# This module counts the YouTube Data API quota units each API key has
+# spent today (quotas reset at midnight Pacific time), spreads requests
+# over a pool of keys and turns new analyses away up front when the pool
+# can't cover them
+
+import contextlib
+import contextvars
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+from zoneinfo import ZoneInfo
+
+DEFAULT_QUOTA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'youtube_quota.db')
+
+# Units each key gets per day unless Google granted more
+DEFAULT_DAILY_QUOTA = 10000
+
+PACIFIC = ZoneInfo("America/Los_Angeles")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS quota_usage (
+        key_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        units INTEGER NOT NULL,
+        PRIMARY KEY (key_id, day)
+    )
+"""
+
+# The reservation held by the analysis running in this context
+_reservation = contextvars.ContextVar("quota_reservation", default=None)
+
+class QuotaExhaustedError(Exception):
+    """Raised when the key pool doesn't have enough quota left today."""
+
+    def __init__(self, message="YouTube API quota exhausted for today"):
+        super().__init__(message)
+
+def pacific_day(now=None):
+    """The quota day (a Pacific time date) `now` falls in, as YYYY-MM-DD."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.astimezone(PACIFIC).date().isoformat()
+
+def seconds_until_reset(now=None):
+    """Seconds until the next midnight Pacific time, when quotas reset."""
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(PACIFIC)
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), PACIFIC)
+    # Subtracting times in the same zone ignores DST changes, so go through UTC
+    return max(1, int((midnight.astimezone(datetime.timezone.utc) - now).total_seconds()))
+
+def key_id(api_key):
+    """Stable identifier for a key, so keys themselves are never written to disk."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+def configured_keys():
+    """API keys from YOUTUBE_API_KEYS (comma-separated), else YOUTUBE_API_KEY."""
+    keys = [key.strip() for key in os.getenv("YOUTUBE_API_KEYS", "").split(',') if key.strip()]
+    if not keys and os.getenv("YOUTUBE_API_KEY"):
+        keys = [os.getenv("YOUTUBE_API_KEY")]
+    # Duplicates would count the same quota twice
+    return list(dict.fromkeys(keys))
+
+class _Reservation:
+    def __init__(self, units):
+        self.outstanding = units
+
+class QuotaBudget:
+    """Daily YouTube quota use per key, in SQLite so every worker process shares it.
+
+    Units are recorded as requests are sent. An analysis reserves the units
+    it expects to need before it starts; the reservation shrinks as its
+    requests are recorded and the rest is released when it finishes.
+    Reservations are per process, so processes sharing the database can
+    still overrun by the requests they have in flight.
+    """
+
+    def __init__(self, keys, path, daily_quota=DEFAULT_DAILY_QUOTA):
+        self.keys = list(keys)
+        self.path = path
+        self.daily_quota = daily_quota
+        self._ids = {key: key_id(key) for key in self.keys}
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def used(self):
+        """Units each key has spent today."""
+        day = pacific_day()
+        rows = dict(self._connect().execute("SELECT key_id, units FROM quota_usage WHERE day = ?", (day,)))
+        return {key: rows.get(self._ids[key], 0) for key in self.keys}
+
+    def remaining(self):
+        """Units each key has left today."""
+        return {key: max(0, self.daily_quota - units) for key, units in self.used().items()}
+
+    def available(self):
+        """Units left across the pool today, less what running analyses have reserved."""
+        with self._lock:
+            reserved = self._reserved
+        return max(0, sum(self.remaining().values()) - reserved)
+
+    def pick_key(self, units=1, exclude=()):
+        """The key with the most quota left that can still afford `units`, or None."""
+        remaining = self.remaining()
+        candidates = [key for key in self.keys if key not in exclude and remaining[key] >= units]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda key: remaining[key])
+
+    def spend(self, api_key, units):
+        """Record `units` spent by `api_key` (keys outside the pool are counted too)."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO quota_usage (key_id, day, units) VALUES (?, ?, ?) "
+                "ON CONFLICT (key_id, day) DO UPDATE SET units = units + excluded.units",
+                (self._ids.get(api_key) or key_id(api_key), pacific_day(), units)
+            )
+        reservation = _reservation.get()
+        if reservation is not None:
+            with self._lock:
+                taken = min(reservation.outstanding, units)
+                reservation.outstanding -= taken
+                self._reserved -= taken
+
+    def mark_exhausted(self, api_key):
+        """Count a key as used up for today (the API said so, whatever our count says)."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO quota_usage (key_id, day, units) VALUES (?, ?, ?) "
+                "ON CONFLICT (key_id, day) DO UPDATE SET units = MAX(units, excluded.units)",
+                (self._ids.get(api_key) or key_id(api_key), pacific_day(), self.daily_quota)
+            )
+
+    @contextlib.contextmanager
+    def reserve(self, units):
+        """Hold `units` for the enclosed work, or raise QuotaExhaustedError if they aren't there."""
+        with self._lock:
+            left = sum(self.remaining().values()) - self._reserved
+            if left < units:
+                raise QuotaExhaustedError(
+                    f"YouTube API quota exhausted for today ({max(0, left)} of the {units} units needed are left)"
+                )
+            self._reserved += units
+        reservation = _Reservation(units)
+        token = _reservation.set(reservation)
+        try:
+            yield
+        finally:
+            _reservation.reset(token)
+            with self._lock:
+                self._reserved -= reservation.outstanding
+                reservation.outstanding = 0
+
+    def stats(self):
+        remaining = self.remaining()
+        with self._lock:
+            reserved = self._reserved
+        return {
+            'day': pacific_day(),
+            'keys': len(self.keys),
+            'dailyQuotaPerKey': self.daily_quota,
+            'remaining': sum(remaining.values()),
+            'reserved': reserved,
+            'exhaustedKeys': sum(1 for units in remaining.values() if units <= 0),
+        }
+
+_quota_budget = None
+_quota_budget_lock = threading.Lock()
+
+def get_quota_budget():
+    """Lazily create the shared quota budget from environment settings."""
+    global _quota_budget
+    if _quota_budget is None:
+        with _quota_budget_lock:
+            if _quota_budget is None:
+                _quota_budget = QuotaBudget(
+                    configured_keys(),
+                    os.getenv("YOUTUBE_QUOTA_PATH", DEFAULT_QUOTA_PATH),
+                    daily_quota=int(os.getenv("YOUTUBE_DAILY_QUOTA", str(DEFAULT_DAILY_QUOTA)))
+                )
+    return _quota_budget
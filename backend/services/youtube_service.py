@@ -1,38 +1,38 @@
 # Backend Service: YouTube Comments Service
 # This module handles fetching and processing YouTube comments
 
-from googleapiclient.discovery import build
+from services.youtube_client import execute_request, youtube_client
 
 def get_comments(video_id, api_key):
     """Get comments for a YouTube video."""
-    youtube = build('youtube', 'v3', developerKey=api_key)
     comments = []
     
     try:
-        response = youtube.commentThreads().list(
-            part="snippet",
-            videoId=video_id,
-            textFormat="plainText",
-            maxResults=100
-        ).execute()
+        with youtube_client(api_key) as youtube:
+            response = execute_request(youtube.commentThreads().list(
+                part="snippet",
+                videoId=video_id,
+                textFormat="plainText",
+                maxResults=100
+            ), api_key=api_key)
         
-        while response and 'items' in response:
-            for item in response['items']:
-                if 'snippet' in item and 'topLevelComment' in item['snippet'] and 'snippet' in item['snippet']['topLevelComment']:
-                    comment = item['snippet']['topLevelComment']['snippet'].get('textDisplay', '')
-                    if comment:
-                        comments.append(comment)
+            while response and 'items' in response:
+                for item in response['items']:
+                    if 'snippet' in item and 'topLevelComment' in item['snippet'] and 'snippet' in item['snippet']['topLevelComment']:
+                        comment = item['snippet']['topLevelComment']['snippet'].get('textDisplay', '')
+                        if comment:
+                            comments.append(comment)
             
-            if 'nextPageToken' in response and len(comments) < 500:
-                response = youtube.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    textFormat="plainText",
-                    pageToken=response['nextPageToken'],
-                    maxResults=100
-                ).execute()
-            else:
-                break
+                if 'nextPageToken' in response and len(comments) < 500:
+                    response = execute_request(youtube.commentThreads().list(
+                        part="snippet",
+                        videoId=video_id,
+                        textFormat="plainText",
+                        pageToken=response['nextPageToken'],
+                        maxResults=100
+                    ), api_key=api_key)
+                else:
+                    break
                 
     except Exception as e:
         print(f"Error fetching comments: {e}")
@@ -51,24 +51,3 @@ def get_comments(video_id, api_key):
         comments = ["No comments were found for this video."]
         
     return comments
-
-def batch_comments(comments, max_tokens=2048):
-    """Split comments into manageable batches for processing."""
-    batches = []
-    current_batch = []
-    current_length = 0
-
-    for comment in comments:
-        comment_length = len(comment.split())
-        if current_length + comment_length > max_tokens:
-            batches.append(current_batch)
-            current_batch = [comment]
-            current_length = comment_length
-        else:
-            current_batch.append(comment)
-            current_length += comment_length
-
-    if current_batch:
-        batches.append(current_batch)
-
-    return batches
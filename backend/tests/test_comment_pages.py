@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+def thread_page(ids, next_page=None):
+    """A commentThreads.list response with one comment per ID, published on the day in its ID."""
+    items = [{
+        'id': comment_id,
+        'snippet': {'topLevelComment': {'id': comment_id, 'snippet': {
+            'textDisplay': f'comment {comment_id}',
+            'publishedAt': f'2024-01-{int(comment_id[1:]):02d}T00:00:00Z',
+            'likeCount': 0
+        }}}
+    } for comment_id in ids]
+    response = {'items': items}
+    if next_page:
+        response['nextPageToken'] = next_page
+    return response
+
+class IncrementalStopTest(unittest.TestCase):
+    def fetch(self, responses, **kwargs):
+        calls = []
+
+        def call_youtube(build):
+            calls.append(build)
+            return responses[len(calls) - 1]
+
+        with mock.patch.object(app, 'call_youtube', call_youtube):
+            pages = list(app.iter_comment_pages('vid', **kwargs))
+        return [[c['id'] for c in page] for page in pages], len(calls)
+
+    def test_stops_at_first_known_comment(self):
+        responses = [thread_page(['c30', 'c29', 'c28'], 'p2'), thread_page(['c27', 'c20', 'c19'], 'p3'),
+                     thread_page(['c18'])]
+        pages, calls = self.fetch(responses, known_ids={'c20', 'c18'})
+        self.assertEqual(pages, [['c30', 'c29', 'c28'], ['c27']])
+        # The page after the known comment is never requested
+        self.assertEqual(calls, 2)
+
+    def test_stops_at_since(self):
+        responses = [thread_page(['c30', 'c25'], 'p2'), thread_page(['c22', 'c21'], 'p3')]
+        pages, calls = self.fetch(responses, since='2024-01-25T00:00:00Z')
+        self.assertEqual(pages, [['c30']])
+        self.assertEqual(calls, 1)
+
+    def test_reads_every_page_by_default(self):
+        responses = [thread_page(['c30'], 'p2'), thread_page(['c29'], 'p3'), thread_page(['c28'])]
+        pages, calls = self.fetch(responses)
+        self.assertEqual(pages, [['c30'], ['c29'], ['c28']])
+        self.assertEqual(calls, 3)
+
+if __name__ == '__main__':
+    unittest.main()
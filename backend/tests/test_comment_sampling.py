@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.comment_sampling import PAGE_SIZE, STRATA, CommentSampler
+
+def make_pages(likes, pages=None):
+    """Comment pages with the given like counts, newest first."""
+    comments = [
+        {'id': f'c{i}', 'text': f'comment {i}', 'likeCount': count,
+         'publishedAt': f'2024-01-01T00:00:{59 - i % 60:02d}Z'}
+        for i, count in enumerate(likes)
+    ]
+    size = pages or PAGE_SIZE
+    return [comments[i:i + size] for i in range(0, len(comments), size)]
+
+def sampled(sampler, pages):
+    return [comment for page in sampler.sample(iter(pages)) for comment in page]
+
+class StratifiedAllocationTest(unittest.TestCase):
+    def test_sample_fills_max_comments_and_covers_every_band(self):
+        # Mostly unliked comments plus a long tail of popular ones
+        likes = [0] * 900 + [2 ** (i % 12) for i in range(100)]
+        sampler = CommentSampler('stratified_likes', max_pages=20, max_comments=50, seed='vid')
+        sample = sampled(sampler, make_pages(likes))
+
+        self.assertEqual(len(sample), 50)
+        self.assertEqual(sampler.comments_kept, 50)
+        self.assertEqual(len({c['id'] for c in sample}), 50)
+        # The few popular comments still get into the sample
+        self.assertTrue(any(c['likeCount'] >= 512 for c in sample))
+        self.assertGreater(sum(1 for c in sample if c['likeCount'] == 0), 25)
+
+    def test_fewer_comments_than_bands_never_exceeds_max_comments(self):
+        likes = [2 ** i for i in range(STRATA * 2)] * 20
+        for max_comments in range(1, STRATA + 2):
+            sampler = CommentSampler('stratified_likes', max_comments=max_comments, seed='vid')
+            self.assertEqual(len(sampled(sampler, make_pages(likes))), max_comments)
+
+    def test_stratified_date_keeps_order_and_is_seeded(self):
+        pages = make_pages([0] * 600)
+        first = sampled(CommentSampler('stratified_date', max_comments=40, seed='vid'), pages)
+        second = sampled(CommentSampler('stratified_date', max_comments=40, seed='vid'), pages)
+        self.assertEqual(first, second)
+        positions = [int(c['id'][1:]) for c in first]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_small_videos_are_kept_whole(self):
+        sampler = CommentSampler('stratified_likes', max_comments=500)
+        self.assertEqual(len(sampled(sampler, make_pages([1, 2, 3] * 10))), 30)
+
+    def test_max_comments_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            CommentSampler('stratified_likes', max_comments=0)
+        with self.assertRaises(ValueError):
+            CommentSampler('no_such_strategy')
+
+class StreamingBudgetTest(unittest.TestCase):
+    def test_recent_stops_reading_at_the_comment_budget(self):
+        read = []
+
+        def pages():
+            for page in make_pages([0] * 1000):
+                read.append(page)
+                yield page
+
+        sampler = CommentSampler('recent', max_pages=20, max_comments=250)
+        sample = [comment for page in sampler.sample(pages()) for comment in page]
+        self.assertEqual(len(sample), 250)
+        self.assertEqual(len(read), 3)
+        self.assertEqual(sampler.page_budget(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
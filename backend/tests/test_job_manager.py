@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import job_manager
+from services.job_manager import JobManager, JobStore
+
+class JobDedupTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'jobs.db')
+        self.release = threading.Event()
+        self.runs = []
+        self.managers = []
+
+    def tearDown(self):
+        self.release.set()
+        # Let running jobs record their result before the file goes away
+        for manager in self.managers:
+            if manager._executor is not None:
+                manager._executor.shutdown(wait=True)
+        self.dir.cleanup()
+
+    def runner(self, job):
+        self.runs.append((job.video_id, dict(job.options)))
+        self.release.wait(5)
+        return {'videoId': job.video_id}
+
+    def manager(self):
+        manager = JobManager(self.runner, JobStore(self.path), max_workers=2)
+        self.managers.append(manager)
+        return manager
+
+    def wait_done(self, manager, job_id):
+        for _ in range(100):
+            job = manager.get(job_id)
+            if not job.active:
+                return job
+            time.sleep(0.02)
+        self.fail(f"job {job_id} did not finish")
+
+    def test_same_video_and_options_join_one_job(self):
+        manager = self.manager()
+        first, created = manager.submit('vid', {'sampling': 'recent'})
+        second, joined_created = manager.submit('vid', {'sampling': 'recent'})
+        self.assertTrue(created)
+        self.assertFalse(joined_created)
+        self.assertEqual(first.id, second.id)
+
+        self.release.set()
+        self.assertEqual(self.wait_done(manager, first.id).result, {'videoId': 'vid'})
+        self.assertEqual(self.runs, [('vid', {'sampling': 'recent'})])
+
+    def test_different_options_run_separately(self):
+        manager = self.manager()
+        first, _ = manager.submit('vid', {'sampling': 'recent'})
+        second, created = manager.submit('vid', {'sampling': 'reservoir'})
+        self.assertTrue(created)
+        self.assertNotEqual(first.id, second.id)
+
+    def test_finished_job_is_not_joined(self):
+        manager = self.manager()
+        self.release.set()
+        first, _ = manager.submit('vid')
+        self.wait_done(manager, first.id)
+        second, created = manager.submit('vid')
+        self.assertTrue(created)
+        self.assertNotEqual(first.id, second.id)
+
+    def test_other_process_joins_through_the_store(self):
+        first, _ = self.manager().submit('vid', {'replies': True})
+        # A second manager on the same file stands in for another worker
+        other = self.manager()
+        joined, created = other.submit('vid', {'replies': True})
+        self.assertFalse(created)
+        self.assertEqual(joined.id, first.id)
+        self.assertTrue(other.get(first.id).active)
+
+        self.release.set()
+        self.assertEqual(self.wait_done(other, first.id).status, 'done')
+
+    def test_job_without_heartbeat_is_failed_and_replaced(self):
+        first, _ = self.manager().submit('vid')
+        other = self.manager()
+        with mock.patch.object(job_manager.time, 'time', return_value=time.time() + job_manager.STALE_AFTER + 1):
+            self.assertEqual(other.get(first.id).status, 'failed')
+            second, created = other.submit('vid')
+        self.assertTrue(created)
+        self.assertNotEqual(second.id, first.id)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.transcript_store import format_timestamp, parse_timestamp
+
+class TimestampTest(unittest.TestCase):
+    def test_parses_seconds_and_clock_positions(self):
+        self.assertEqual(parse_timestamp('150'), 150.0)
+        self.assertEqual(parse_timestamp(' 90.5 '), 90.5)
+        self.assertEqual(parse_timestamp('2:30'), 150.0)
+        self.assertEqual(parse_timestamp('0:59.9'), 59.9)
+        self.assertEqual(parse_timestamp('1:02:03'), 3723.0)
+        self.assertEqual(parse_timestamp('0'), 0.0)
+
+    def test_rejects_anything_else(self):
+        for value in ['nan', 'inf', '-5', '2:-30', '1e3', '1:75', '1:60:00', '', ':30', '1::2',
+                      '1:2:3:4', '0x10', '2:30 extra', '١٢']:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_timestamp(value)
+
+    def test_formatted_positions_parse_back(self):
+        for seconds in (0, 59, 60, 150, 3599, 3600, 3723, 36000):
+            self.assertEqual(parse_timestamp(format_timestamp(seconds)), seconds)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.video_state import VideoStateStore
+
+class VideoStateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'video_state.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_parallel_incremental_saves(self):
+        store = VideoStateStore(self.path)
+        store.save('vid', [{'id': 'c0', 'publishedAt': '2024-01-01T00:00:00Z'}],
+                   'summary', {'positive': 1, 'negative': 0, 'neutral': 0}, 1, replace=True)
+        errors = []
+
+        def save_many(worker):
+            try:
+                for i in range(50):
+                    comments = [{'id': f'c{worker}-{i}', 'publishedAt': '2024-01-02T00:00:00Z'}] if i % 2 else []
+                    store.save('vid', comments, 'summary', {'positive': 1, 'negative': 0, 'neutral': 0}, 1)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save_many, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        state = store.get('vid')
+        self.assertEqual(len(state.seen_ids), 1 + 4 * 25)
+        self.assertEqual(state.newest_published_at, '2024-01-02T00:00:00Z')
+
+    def test_incremental_save_merges_seen_comments(self):
+        store = VideoStateStore(self.path)
+        counts = {'positive': 1, 'negative': 1, 'neutral': 0}
+        store.save('vid', [{'id': 'a', 'publishedAt': '2024-01-01T00:00:00Z'},
+                           {'id': 'b', 'publishedAt': '2024-01-02T00:00:00Z'}],
+                   'first', counts, 2, replace=True)
+        store.save('vid', [{'id': 'c', 'publishedAt': '2024-01-03T00:00:00Z'},
+                           # Replies don't move the newest top-level date
+                           {'id': 'r', 'parentId': 'a', 'publishedAt': '2024-02-01T00:00:00Z'}],
+                   'merged', {'positive': 2, 'negative': 1, 'neutral': 1}, 4)
+
+        state = store.get('vid')
+        self.assertEqual(state.seen_ids, {'a', 'b', 'c', 'r'})
+        self.assertEqual(state.newest_published_at, '2024-01-03T00:00:00Z')
+        self.assertEqual(state.comment_summary, 'merged')
+        self.assertEqual(state.comment_count, 4)
+
+        # A full analysis starts over
+        store.save('vid', [{'id': 'd', 'publishedAt': '2024-01-04T00:00:00Z'}], 'full', counts, 1, replace=True)
+        self.assertEqual(store.get('vid').seen_ids, {'d'})
+
+    def test_state_is_kept_per_options(self):
+        store = VideoStateStore(self.path)
+        counts = {'positive': 1, 'negative': 0, 'neutral': 0}
+        options = {'sampling': 'stratified_likes', 'replies': True}
+        store.save('vid', [{'id': 'a', 'publishedAt': '2024-01-01T00:00:00Z'}], 'summary', counts, 1,
+                   replace=True, options=options)
+        self.assertIsNone(store.get('vid'))
+        self.assertIsNone(store.get('vid', {'sampling': 'recent', 'replies': True}))
+        self.assertEqual(store.get('vid', options).comment_summary, 'summary')
+
+if __name__ == '__main__':
+    unittest.main()
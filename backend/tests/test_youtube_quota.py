@@ -0,0 +1,105 @@
+import contextlib
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import youtube_client, youtube_quota
+from services.youtube_quota import QuotaBudget, QuotaExhaustedError, pacific_day, seconds_until_reset
+
+UTC = datetime.timezone.utc
+
+class QuotaDayTest(unittest.TestCase):
+    def test_day_rolls_over_at_pacific_midnight(self):
+        # 07:59 UTC is 23:59 PST (UTC-8), 08:00 UTC the next Pacific day
+        self.assertEqual(pacific_day(datetime.datetime(2024, 1, 10, 7, 59, tzinfo=UTC)), '2024-01-09')
+        self.assertEqual(pacific_day(datetime.datetime(2024, 1, 10, 8, 0, tzinfo=UTC)), '2024-01-10')
+        # In summer (PDT, UTC-7) it is an hour earlier in UTC
+        self.assertEqual(pacific_day(datetime.datetime(2024, 7, 10, 7, 0, tzinfo=UTC)), '2024-07-10')
+
+    def test_seconds_until_reset(self):
+        self.assertEqual(seconds_until_reset(datetime.datetime(2024, 1, 10, 7, 0, tzinfo=UTC)), 3600)
+        # The day the clocks go forward is 23 hours long
+        self.assertEqual(seconds_until_reset(datetime.datetime(2024, 3, 10, 8, 0, tzinfo=UTC)), 23 * 3600)
+
+class QuotaBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.budget = QuotaBudget(['key-a', 'key-b'], os.path.join(self.dir.name, 'quota.db'), daily_quota=100)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_usage_resets_on_a_new_day(self):
+        with mock.patch.object(youtube_quota, 'pacific_day', return_value='2024-01-09'):
+            self.budget.spend('key-a', 60)
+            self.budget.mark_exhausted('key-b')
+            self.assertEqual(self.budget.remaining(), {'key-a': 40, 'key-b': 0})
+        with mock.patch.object(youtube_quota, 'pacific_day', return_value='2024-01-10'):
+            self.assertEqual(self.budget.remaining(), {'key-a': 100, 'key-b': 100})
+
+    def test_pick_key_prefers_the_most_quota_left(self):
+        self.budget.spend('key-a', 30)
+        self.assertEqual(self.budget.pick_key(), 'key-b')
+        self.assertEqual(self.budget.pick_key(exclude={'key-b'}), 'key-a')
+        self.assertIsNone(self.budget.pick_key(units=80, exclude={'key-b'}))
+
+    def test_reservations_hold_units_until_released(self):
+        with self.budget.reserve(150):
+            self.assertEqual(self.budget.available(), 50)
+            with self.assertRaises(QuotaExhaustedError):
+                with self.budget.reserve(60):
+                    pass
+            # Spending inside the reservation uses it up instead of counting twice
+            self.budget.spend('key-a', 20)
+            self.assertEqual(self.budget.available(), 50)
+        self.assertEqual(self.budget.available(), 180)
+
+class KeyRotationTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.budget = QuotaBudget(['key-a', 'key-b'], os.path.join(self.dir.name, 'quota.db'), daily_quota=100)
+        self.out_of_quota = set()
+        self.used = []
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @contextlib.contextmanager
+    def client(self, api_key):
+        yield api_key
+
+    def execute(self, request, cancel_event=None, api_key=None):
+        self.used.append(api_key)
+        if api_key in self.out_of_quota:
+            raise Exception("The request cannot be completed because you have exceeded your quotaExceeded")
+        return {'key': api_key}
+
+    def call(self):
+        with mock.patch.object(youtube_client, 'get_quota_budget', return_value=self.budget), \
+                mock.patch.object(youtube_client, 'youtube_client', self.client), \
+                mock.patch.object(youtube_client, 'execute_request', self.execute):
+            return youtube_client.call_youtube(lambda youtube: youtube)
+
+    def test_rotates_to_the_next_key_when_one_runs_out(self):
+        self.budget.spend('key-b', 10)
+        self.out_of_quota.add('key-a')
+        self.assertEqual(self.call(), {'key': 'key-b'})
+        self.assertEqual(self.used, ['key-a', 'key-b'])
+        # The exhausted key is not tried again today
+        self.assertEqual(self.budget.remaining()['key-a'], 0)
+        self.assertEqual(self.call(), {'key': 'key-b'})
+        self.assertEqual(self.used[-1], 'key-b')
+
+    def test_raises_once_every_key_is_out_of_quota(self):
+        self.out_of_quota.update({'key-a', 'key-b'})
+        with self.assertRaises(QuotaExhaustedError):
+            self.call()
+        self.assertEqual(sorted(self.used), ['key-a', 'key-b'])
+
+if __name__ == '__main__':
+    unittest.main()
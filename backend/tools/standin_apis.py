@@ -0,0 +1,519 @@
+#!/usr/bin/env python
+# Backend Tool: Stand-in APIs
+# A local server implementing the parts of the OpenAI chat completions API
+# and the YouTube Data API v3 that the backend uses, with configurable
+# latency, injected failures and synthetic comment corpora of any size, so
+# the pipeline can be run, load-tested and profiled without network access.
+#
+#   python tools/standin_apis.py --port 8081 --comments 5000 \
+#       --openai-latency lognormal:800:0.5 --openai-error-rate 0.02
+#
+# Then point the backend at it:
+#
+#   OPENAI_BASE_URL=http://localhost:8081/v1
+#   OPENAI_API_KEY=standin
+#   YOUTUBE_API_BASE_URL=http://localhost:8081/
+#   YOUTUBE_API_KEY=standin
+
+import argparse
+import functools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+# Synthetic comment vocabulary, roughly the mix seen on real videos
+POSITIVE = ["Great video", "Loved this", "Thanks for the helpful explanation", "Amazing editing",
+            "This was excellent", "Wonderful work as always", "Really good breakdown"]
+NEGATIVE = ["The audio is bad", "Terrible pacing", "Worst take I've seen", "Pretty disappointing",
+            "Useless clickbait", "I hate the music in this one", "Poor research honestly"]
+NEUTRAL = ["What camera do you use", "Who else is watching this", "Can you cover the next part",
+           "Where is this filmed", "How long did this take", "Watching from Brazil",
+           "Is there a follow up"]
+DETAILS = ["the part at {m}:{s:02d}", "the intro", "the second half", "the examples", "the ending",
+           "the graphs", "the interview", "the sound design", "the explanation of the basics"]
+# Replies embedded in a commentThreads.list item when part includes replies
+EMBEDDED_REPLIES = 5
+
+DUPLICATES = ["First!", "first", "Who's here in 2024?", "Who's watching in 2025?",
+              "Like if you're watching this", "Check out my channel for free giveaways!!"]
+
+class LatencyDistribution:
+    """Response delay in seconds, parsed from a spec such as `lognormal:800:0.5`.
+
+    Specs (times in milliseconds): `fixed:MS`, `uniform:MIN:MAX`,
+    `exponential:MEAN`, `lognormal:MEDIAN:SIGMA`, or `none`.
+    """
+
+    def __init__(self, spec):
+        parts = (spec or 'none').split(':')
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        expected = {'none': 0, 'fixed': 1, 'uniform': 2, 'exponential': 1, 'lognormal': 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self, rnd):
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rnd.uniform(*self.params)
+        elif self.kind == 'exponential':
+            ms = rnd.expovariate(1.0 / self.params[0]) if self.params[0] else 0.0
+        elif self.kind == 'lognormal':
+            ms = rnd.lognormvariate(math.log(self.params[0]), self.params[1]) if self.params[0] else 0.0
+        else:
+            ms = 0.0
+        return ms / 1000.0
+
+class StandinState:
+    """Configuration plus the counters used for quota injection."""
+
+    def __init__(self, args):
+        self.args = args
+        self.openai_latency = LatencyDistribution(args.openai_latency)
+        self.youtube_latency = LatencyDistribution(args.youtube_latency)
+        self.openai_requests = 0
+        self.youtube_units = 0
+        self.youtube_units_by_key = {}
+        self._lock = threading.Lock()
+        self._rnd = random.Random(args.seed)
+        # Fixed "now" so corpora are identical across runs
+        self.epoch = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    def random(self):
+        with self._lock:
+            return self._rnd.random()
+
+    def delay(self, latency):
+        with self._lock:
+            seconds = latency.sample(self._rnd)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def count_openai_request(self):
+        with self._lock:
+            self.openai_requests += 1
+            return self.openai_requests
+
+    def spend_youtube_units(self, key, units):
+        """Count units against an API key; returns what that key has spent."""
+        with self._lock:
+            self.youtube_units += units
+            spent = self.youtube_units_by_key.get(key, 0) + units
+            self.youtube_units_by_key[key] = spent
+            return spent
+
+state = None
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / 4))
+
+# --- OpenAI ---------------------------------------------------------------
+
+def openai_error(status, message, error_type, code=None, retry_after=None):
+    response = jsonify({'error': {'message': message, 'type': error_type, 'param': None, 'code': code}})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def injected_openai_failure():
+    args = state.args
+    count = state.count_openai_request()
+    if args.openai_quota_after is not None and count > args.openai_quota_after:
+        return openai_error(429, "You exceeded your current quota, please check your plan and billing details.",
+                            'insufficient_quota', 'insufficient_quota')
+    roll = state.random()
+    if roll < args.openai_rate_limit_rate:
+        return openai_error(429, "Rate limit reached for requests", 'requests', 'rate_limit_exceeded',
+                            retry_after=args.retry_after)
+    if roll < args.openai_rate_limit_rate + args.openai_error_rate:
+        return openai_error(503, "The server is overloaded or not ready yet.", 'server_error',
+                            retry_after=args.retry_after)
+    return None
+
+def completion_text(messages):
+    # Deterministic "summary": echoes the start of the last message so
+    # results can be traced back to their input
+    prompt = messages[-1].get('content', '') if messages else ''
+    words = prompt.split()
+    body = " ".join(words[:state.args.completion_words])
+    return f"Summary of {len(words)} words: {body}"
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json(silent=True) or {}
+    messages = data.get('messages') or []
+    model = data.get('model', 'gpt-3.5-turbo')
+
+    state.delay(state.openai_latency)
+    failure = injected_openai_failure()
+    if failure is not None:
+        return failure
+
+    content = completion_text(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    prompt_tokens = sum(estimate_tokens(m.get('content') or '') + 4 for m in messages) + 3
+
+    if not data.get('stream'):
+        return jsonify({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': estimate_tokens(content),
+                'total_tokens': prompt_tokens + estimate_tokens(content)
+            }
+        })
+
+    def chunk(delta, finish_reason=None):
+        return "data: " + json.dumps({
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }) + "\n\n"
+
+    def generate():
+        yield chunk({'role': 'assistant', 'content': ''})
+        for i, word in enumerate(content.split(' ')):
+            if state.args.stream_chunk_delay:
+                time.sleep(state.args.stream_chunk_delay / 1000.0)
+            yield chunk({'content': word if i == 0 else ' ' + word})
+        yield chunk({}, 'stop')
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype='text/event-stream')
+
+# --- YouTube Data API -----------------------------------------------------
+
+def youtube_error(status, reason, message, domain='global'):
+    response = jsonify({'error': {
+        'code': status,
+        'message': message,
+        'errors': [{'message': message, 'domain': domain, 'reason': reason}]
+    }})
+    response.status_code = status
+    return response
+
+def injected_youtube_failure(units):
+    args = state.args
+    spent = state.spend_youtube_units(request.args.get('key', ''), units)
+    if args.youtube_quota_units is not None and spent > args.youtube_quota_units:
+        return youtube_error(403, 'quotaExceeded',
+                             'The request cannot be completed because you have exceeded your quota.',
+                             domain='youtube.quota')
+    if state.random() < args.youtube_error_rate:
+        return youtube_error(503, 'backendError', 'Backend Error')
+    return None
+
+def corpus_size(video_id):
+    # A video ID like "std-250" overrides the default corpus size
+    suffix = video_id.rsplit('-', 1)[-1]
+    if suffix.isdigit() and '-' in video_id:
+        return int(suffix)
+    return state.args.comments
+
+def synthetic_text(rnd):
+    if rnd.random() < state.args.duplicate_rate:
+        return rnd.choice(DUPLICATES)
+    pool = rnd.choices([POSITIVE, NEGATIVE, NEUTRAL], weights=[5, 2, 3])[0]
+    sentences = [rnd.choice(pool)]
+    for _ in range(rnd.choices([0, 1, 2, 4, 8], weights=[4, 3, 2, 1, 1])[0]):
+        detail = rnd.choice(DETAILS).format(m=rnd.randint(0, 20), s=rnd.randint(0, 59))
+        sentences.append(f"{rnd.choice(POSITIVE + NEGATIVE + NEUTRAL)}, especially {detail}")
+    return ". ".join(sentences) + rnd.choice([".", "!", "?", ""])
+
+def reply_count(video_id, index):
+    """Replies to comment `index`: none for most, a long tail for a few."""
+    if not state.args.replies:
+        return 0
+    rnd = random.Random(f"{video_id}:{index}:replies")
+    if rnd.random() > 0.3:
+        return 0
+    return int(rnd.expovariate(1.0 / state.args.replies)) + 1
+
+def synthetic_reply(video_id, index, number, published):
+    """Reply `number` (0 is the oldest) to comment `index`."""
+    rnd = random.Random(f"{video_id}:{index}:reply:{number}")
+    text = synthetic_text(rnd)
+    timestamp = (published + timedelta(minutes=3 * number + rnd.randint(1, 3))).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'kind': 'youtube#comment',
+        'id': f"{video_id}.{index}.{number}",
+        'snippet': {
+            'videoId': video_id,
+            'textDisplay': text,
+            'textOriginal': text,
+            'parentId': f"{video_id}.{index}",
+            'authorDisplayName': f"viewer{rnd.randint(1, 100000)}",
+            'likeCount': int(rnd.paretovariate(1.5)) - 1,
+            'publishedAt': timestamp,
+            'updatedAt': timestamp
+        }
+    }
+
+def synthetic_comment(video_id, index, with_replies=False):
+    """Comment `index` (0 is the newest) of a video's synthetic corpus."""
+    rnd = random.Random(f"{video_id}:{index}")
+    text = synthetic_text(rnd)
+    # Newest first, a few minutes apart
+    published = state.epoch - timedelta(minutes=5 * index + rnd.randint(0, 4))
+    timestamp = published.strftime('%Y-%m-%dT%H:%M:%SZ')
+    replies = reply_count(video_id, index)
+    thread = {
+        'kind': 'youtube#commentThread',
+        'id': f"{video_id}.{index}",
+        'snippet': {
+            'videoId': video_id,
+            'topLevelComment': {
+                'kind': 'youtube#comment',
+                'id': f"{video_id}.{index}",
+                'snippet': {
+                    'videoId': video_id,
+                    'textDisplay': text,
+                    'textOriginal': text,
+                    'authorDisplayName': f"viewer{rnd.randint(1, 100000)}",
+                    'likeCount': int(rnd.paretovariate(1.2)) - 1,
+                    'publishedAt': timestamp,
+                    'updatedAt': timestamp
+                }
+            },
+            'canReply': True,
+            'totalReplyCount': replies,
+            'isPublic': True
+        }
+    }
+    if with_replies and replies:
+        # Like the real API, only the first few replies are embedded
+        thread['replies'] = {'comments': [synthetic_reply(video_id, index, n, published)
+                                          for n in range(min(EMBEDDED_REPLIES, replies))]}
+    return thread
+
+@functools.lru_cache(maxsize=32)
+def relevance_order(video_id, size):
+    """Comment indexes of a corpus with the most liked first, standing in for order=relevance."""
+    likes = [synthetic_comment(video_id, i)['snippet']['topLevelComment']['snippet']['likeCount'] for i in range(size)]
+    return sorted(range(size), key=lambda i: -likes[i])
+
+@app.route('/youtube/v3/videos', methods=['GET'])
+def videos_list():
+    state.delay(state.youtube_latency)
+    failure = injected_youtube_failure(1)
+    if failure is not None:
+        return failure
+
+    items = []
+    for video_id in filter(None, request.args.get('id', '').split(',')):
+        if video_id in state.args.missing_videos:
+            continue
+        rnd = random.Random(video_id)
+        items.append({
+            'kind': 'youtube#video',
+            'id': video_id,
+            'snippet': {
+                'title': f"Stand-in video {video_id}",
+                'channelTitle': f"Stand-in channel {rnd.randint(1, 50)}",
+                'description': "Synthetic video served by tools/standin_apis.py",
+                'publishedAt': (state.epoch - timedelta(days=rnd.randint(1, 365))).strftime('%Y-%m-%dT%H:%M:%SZ')
+            },
+            'statistics': {
+                'viewCount': str(rnd.randint(1000, 10 ** 7)),
+                'likeCount': str(rnd.randint(10, 10 ** 5)),
+                'commentCount': str(corpus_size(video_id))
+            }
+        })
+    return jsonify({'kind': 'youtube#videoListResponse', 'items': items,
+                    'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}})
+
+@app.route('/youtube/v3/commentThreads', methods=['GET'])
+def comment_threads_list():
+    state.delay(state.youtube_latency)
+    failure = injected_youtube_failure(1)
+    if failure is not None:
+        return failure
+
+    video_id = request.args.get('videoId', '')
+    if video_id in state.args.missing_videos:
+        return youtube_error(404, 'videoNotFound', 'The video identified by the videoId parameter could not be found.')
+    if video_id in state.args.comments_disabled:
+        return youtube_error(403, 'commentsDisabled', 'The video has disabled comments.')
+
+    size = corpus_size(video_id)
+    max_results = min(100, max(1, int(request.args.get('maxResults', 20))))
+    try:
+        start = int(request.args.get('pageToken') or 0)
+    except ValueError:
+        return youtube_error(400, 'invalidPageToken', 'The page token is invalid.')
+    end = min(size, start + max_results)
+    with_replies = 'replies' in request.args.get('part', '').split(',')
+    if request.args.get('order') == 'relevance':
+        indexes = relevance_order(video_id, size)[start:end]
+    else:
+        indexes = range(start, end)
+
+    response = {
+        'kind': 'youtube#commentThreadListResponse',
+        'items': [synthetic_comment(video_id, i, with_replies) for i in indexes],
+        'pageInfo': {'totalResults': end - start, 'resultsPerPage': max_results}
+    }
+    if end < size:
+        response['nextPageToken'] = str(end)
+    return jsonify(response)
+
+@app.route('/youtube/v3/comments', methods=['GET'])
+def comments_list():
+    state.delay(state.youtube_latency)
+    failure = injected_youtube_failure(1)
+    if failure is not None:
+        return failure
+
+    parent_id = request.args.get('parentId', '')
+    video_id, _, index = parent_id.rpartition('.')
+    if not video_id or not index.isdigit() or int(index) >= corpus_size(video_id):
+        return youtube_error(404, 'commentNotFound', 'One or more of the comments could not be found.')
+    index = int(index)
+    total = reply_count(video_id, index)
+    max_results = min(100, max(1, int(request.args.get('maxResults', 20))))
+    try:
+        start = int(request.args.get('pageToken') or 0)
+    except ValueError:
+        return youtube_error(400, 'invalidPageToken', 'The page token is invalid.')
+    end = min(total, start + max_results)
+    published = datetime.strptime(
+        synthetic_comment(video_id, index)['snippet']['topLevelComment']['snippet']['publishedAt'],
+        '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+    response = {
+        'kind': 'youtube#commentListResponse',
+        'items': [synthetic_reply(video_id, index, n, published) for n in range(start, end)],
+        'pageInfo': {'totalResults': end - start, 'resultsPerPage': max_results}
+    }
+    if end < total:
+        response['nextPageToken'] = str(end)
+    return jsonify(response)
+
+def playlist_video_id(playlist_id, index):
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+    rnd = random.Random(f"{playlist_id}:{index}")
+    return "".join(rnd.choice(alphabet) for _ in range(11))
+
+@app.route('/youtube/v3/playlistItems', methods=['GET'])
+def playlist_items_list():
+    state.delay(state.youtube_latency)
+    failure = injected_youtube_failure(1)
+    if failure is not None:
+        return failure
+
+    playlist_id = request.args.get('playlistId', '')
+    size = corpus_size(playlist_id) if '-' in playlist_id else state.args.playlist_size
+    max_results = min(50, max(1, int(request.args.get('maxResults', 5))))
+    start = int(request.args.get('pageToken') or 0)
+    end = min(size, start + max_results)
+    response = {
+        'kind': 'youtube#playlistItemListResponse',
+        'items': [{
+            'kind': 'youtube#playlistItem',
+            'id': f"{playlist_id}.{i}",
+            'contentDetails': {'videoId': playlist_video_id(playlist_id, i)}
+        } for i in range(start, end)],
+        'pageInfo': {'totalResults': size, 'resultsPerPage': max_results}
+    }
+    if end < size:
+        response['nextPageToken'] = str(end)
+    return jsonify(response)
+
+@app.route('/youtube/v3/channels', methods=['GET'])
+def channels_list():
+    state.delay(state.youtube_latency)
+    failure = injected_youtube_failure(1)
+    if failure is not None:
+        return failure
+
+    items = []
+    for channel_id in filter(None, request.args.get('id', '').split(',')):
+        if channel_id in state.args.missing_videos:
+            continue
+        # Like YouTube, the uploads playlist is the channel ID with UU for UC
+        uploads = "UU" + channel_id[2:] if channel_id.startswith("UC") else "UU" + channel_id
+        items.append({
+            'kind': 'youtube#channel',
+            'id': channel_id,
+            'contentDetails': {'relatedPlaylists': {'likes': '', 'uploads': uploads}}
+        })
+    return jsonify({'kind': 'youtube#channelListResponse', 'items': items,
+                    'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}})
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'openaiRequests': state.openai_requests,
+        'youtubeUnits': state.youtube_units,
+        'youtubeUnitsByKey': dict(state.youtube_units_by_key)
+    })
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-ins for the OpenAI and YouTube Data APIs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--seed', type=int, default=0, help="seed for latency and failure injection")
+    parser.add_argument('--openai-latency', default='none',
+                        help="fixed:MS, uniform:MIN:MAX, exponential:MEAN, lognormal:MEDIAN:SIGMA or none")
+    parser.add_argument('--youtube-latency', default='none', help="same format as --openai-latency")
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.0,
+                        help="milliseconds between streamed completion chunks")
+    parser.add_argument('--completion-words', type=int, default=60,
+                        help="words of the input echoed back in each completion")
+    parser.add_argument('--openai-error-rate', type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument('--openai-rate-limit-rate', type=float, default=0.0, help="fraction of 429 rate limits")
+    parser.add_argument('--openai-quota-after', type=int, default=None,
+                        help="answer insufficient_quota after this many requests")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds on injected errors")
+    parser.add_argument('--youtube-error-rate', type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument('--youtube-quota-units', type=int, default=None,
+                        help="answer quotaExceeded once an API key has spent this many units")
+    parser.add_argument('--comments', type=int, default=1000,
+                        help="comments per video (a video ID ending in -N gets N)")
+    parser.add_argument('--replies', type=float, default=0.0,
+                        help="mean replies per comment that has any (0 disables replies)")
+    parser.add_argument('--playlist-size', type=int, default=25,
+                        help="videos per playlist or channel (a playlist ID ending in -N gets N)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.15,
+                        help="fraction of comments drawn from common duplicates")
+    parser.add_argument('--missing-videos', default='',
+                        help="comma-separated video or channel IDs that don't exist")
+    parser.add_argument('--comments-disabled', default='', help="comma-separated video IDs with comments off")
+    args = parser.parse_args(argv)
+    args.missing_videos = set(filter(None, args.missing_videos.split(',')))
+    args.comments_disabled = set(filter(None, args.comments_disabled.split(',')))
+    return args
+
+def configure(args):
+    """Set up the stand-in state (also used when embedding the app in another process)."""
+    global state
+    state = StandinState(args)
+    return app
+
+if __name__ == '__main__':
+    args = parse_args()
+    configure(args)
+    print(f"Stand-in OpenAI and YouTube APIs on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, debug=False, use_reloader=False, threaded=True)
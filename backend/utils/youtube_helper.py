@@ -3,7 +3,8 @@
 # communicating with YouTube API
 
 import re
-from googleapiclient.discovery import build
+
+from services.youtube_client import execute_request, youtube_client
 
 def extract_video_id(url):
     """Extract the video ID from a YouTube URL."""
@@ -13,11 +14,11 @@ def extract_video_id(url):
 
 def get_video_info(video_id, api_key):
     """Get basic information about a YouTube video."""
-    youtube = build('youtube', 'v3', developerKey=api_key)
-    response = youtube.videos().list(
-        part="snippet",
-        id=video_id
-    ).execute()
+    with youtube_client(api_key) as youtube:
+        response = execute_request(youtube.videos().list(
+            part="snippet",
+            id=video_id
+        ), api_key=api_key)
     
     if not response['items']:
         return None
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+WSGI entry point for production serving.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (see gunicorn.conf.py) this module is imported once in the
+gunicorn master, so everything loaded here is shared copy-on-write by the
+workers instead of being loaded again in each of them.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+
+def preload():
+    """Load read-only models and documents before workers are forked.
+
+    Nothing here may leave a network connection, database or thread pool
+    open: those must not be shared across fork and are created lazily per
+    worker. The YouTube discovery document is only loaded from disk here
+    (a worker downloads it on first use if there is no local copy), but
+    tiktoken downloads an encoding's vocabulary the first time it is used
+    on a machine unless TIKTOKEN_CACHE_DIR already holds it.
+    """
+    from services.lexicon_sentiment import get_lexicon_engine
+    from services.tokenizer import get_encoder
+    from services.youtube_client import get_discovery_document
+
+    get_lexicon_engine()
+    if get_encoder() is None:
+        # Let each worker try again rather than inherit the failure
+        get_encoder.cache_clear()
+    try:
+        if get_discovery_document(offline=True) is None:
+            print("No local YouTube discovery document; workers will fetch it")
+    except Exception as e:
+        print(f"Could not preload YouTube discovery document: {e}")
+
+    # The transformer model is only needed by the experimental services
+    if os.getenv("PRELOAD_TRANSFORMER", "false").lower() in ('1', 'true', 'yes'):
+        try:
+            from services.sentiment_service import get_sentiment_analyzer
+            get_sentiment_analyzer()
+        except ImportError as e:
+            print(f"Could not preload sentiment model: {e}")
+
+preload()
+
+application = app